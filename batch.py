@@ -0,0 +1,168 @@
+# !/bin/env python
+
+"""
+Batch Habit Tracker
+runs the report for many trackers (sheets / recipients) in one process
+
+sheets (or stream files) are fetched in a thread pool, summaries + html are built in a
+process pool and every email goes through one pooled mail queue.
+
+trackers file is a list of per-tracker configs laid over config.json,
+see trackers_template.json
+
+"""
+
+import os
+import time
+import argparse
+from logging import Logger
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from main import HabitTracker, GSHEET_KEY, GSHEET_ID, local_today
+from utils.logMan import createLogger
+from utils.dataMan import DataManager as DM
+from utils.sheetCache import authorize, open_sheet
+from utils.dataSource import SheetSource, StreamSource
+from utils.mailMan import build_email, make_queue
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fetch(client, gsheet_id: str, local_sheet: str, logger: Logger, source_path: str = None):
+    """ sync one sheet (or stream file) through its local cache (runs in the thread pool) """
+    start = time.perf_counter()
+    if source_path:
+        source = StreamSource(source_path, os.path.join(DIR, 'cache'), logger=logger)
+    else:
+        source = SheetSource(open_sheet(client, gsheet_id, local_sheet), os.path.join(DIR, 'cache'), gsheet_id, logger=logger)
+    return source.read(), time.perf_counter() - start
+
+
+def build(tracker: dict, data, config_file: str, credentials_file: str):
+    """ summaries + html for one tracker (runs in the process pool) """
+    start = time.perf_counter()
+    ht = HabitTracker(
+        config_file=config_file,
+        credentials_file=credentials_file,
+        logger=Logger('batch'),
+        tracker=tracker,
+        data=data,
+        )
+    return ht.message, ht.images, ht.attachments, time.perf_counter() - start, ht.timings
+
+
+def run_batch(trackers_file: str = 'trackers.json',
+              config_file: str = 'config.json',
+              credentials_file: str = 'credentials.json',
+              fetch_workers: int = 4,
+              workers: int = None,
+              send: bool = True,
+              logger: Logger = None,
+              ) -> dict:
+    """ run every tracker in trackers_file, returns {name: timings} """
+    if logger == None:
+        logger = createLogger(root=os.path.join(DIR, 'log'), useStreamHandler=True)
+
+    config = DM(config_file, logger=logger, default={}).data
+    credentials = DM(credentials_file, logger=logger, default={}).data
+    trackers = DM(trackers_file, logger=logger, default=[]).data
+
+    for i, tracker in enumerate(trackers):
+        tracker.setdefault('gsheet_id', config.get('gsheet_id', GSHEET_ID))
+        tracker.setdefault('name', f"{i}-{tracker['gsheet_id']}")
+    timings = {t['name']: {'status': 'failed'} for t in trackers}
+
+    # every sheet is fetched once, even if several trackers share it
+    sheets = {}
+    for tracker in trackers:
+        local_sheet = tracker.get('local_sheet', config.get('local_sheet'))
+        if local_sheet:
+            local_sheet = os.path.join(DIR, local_sheet)
+        source_path = tracker.get('source_path', config.get('source_path'))
+        if source_path:
+            local_sheet, source_path = None, os.path.join(DIR, source_path)
+        sheets.setdefault((tracker['gsheet_id'], local_sheet, source_path), []).append(tracker)
+
+    client = None
+    if any(local_sheet is None and source_path is None for _, local_sheet, source_path in sheets):
+        key = config.get('gsheet_key', GSHEET_KEY)
+        client = authorize(os.path.join(DIR, key))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+         ProcessPoolExecutor(max_workers=workers) as build_pool:
+
+        fetches = {
+            fetch_pool.submit(fetch, client, gsheet_id, local_sheet, logger, source_path): (gsheet_id, local_sheet, source_path)
+            for gsheet_id, local_sheet, source_path in sheets
+            }
+
+        builds = {}
+        for future in as_completed(fetches):
+            key = fetches[future]
+            gsheet_id = key[0]
+            try:
+                data, seconds = future.result()
+            except Exception as e:
+                logger.error(f'fetch of {gsheet_id} failed: {e}')
+                continue
+            for tracker in sheets[key]:
+                timings[tracker['name']]['fetch'] = seconds
+                builds[build_pool.submit(build, tracker, data, config_file, credentials_file)] = tracker
+
+        messages = []
+        for future in as_completed(builds):
+            tracker = builds[future]
+            try:
+                message, images, attachments, seconds, stages = future.result()
+            except Exception as e:
+                logger.error(f"build of {tracker['name']} failed: {e}")
+                continue
+            timings[tracker['name']]['build'] = seconds
+            timings[tracker['name']]['stages'] = stages
+            messages.append((tracker, message, images, attachments))
+
+    if send and len(messages) > 0:
+        mail = make_queue(config, credentials, logger=logger)
+        for tracker, message, images, attachments in messages:
+            today = local_today(tracker.get('timezone', config.get('timezone')))
+            mail.put(build_email({**config, **tracker}, message, images, attachments, today))
+        t = time.perf_counter()
+        with mail.pool:
+            results = mail.flush()
+        # the queue sends in batches, so the send time is shared
+        seconds = (time.perf_counter() - t) / len(messages)
+        for (tracker, *_), sent in zip(messages, results):
+            timings[tracker['name']]['send'] = seconds
+            timings[tracker['name']]['status'] = 'sent' if sent else 'failed'
+    else:
+        for tracker, *_ in messages:
+            timings[tracker['name']]['status'] = 'built'
+
+    for name, t in timings.items():
+        stages = ' '.join(f'{k}={t[k]:.3f}s' for k in ('fetch', 'build', 'send') if k in t)
+        if 'stages' in t:
+            stages += ' (' + ' '.join(f'{k}={v:.3f}s' for k, v in t['stages'].items()) + ')'
+        logger.info(f"{name}: {t['status']} {stages}")
+    logger.info(f'batch of {len(trackers)} trackers done in {time.perf_counter() - start:.3f}s')
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run the habit tracker report for many trackers')
+    parser.add_argument('trackers', nargs='?', default='trackers.json')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--credentials', default='credentials.json')
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-send', action='store_true', help='build the reports but do not email them')
+    args = parser.parse_args()
+
+    run_batch(
+        trackers_file=args.trackers,
+        config_file=args.config,
+        credentials_file=args.credentials,
+        fetch_workers=args.fetch_workers,
+        workers=args.workers,
+        send=not args.no_send,
+        )
@@ -0,0 +1,183 @@
+# !/bin/env python
+
+"""
+Habit Tracker Benchmarks
+
+runs every pipeline stage of HabitTracker against synthetic sheets
+(see utils/synth.py) from 1 week to 10 years and 5 to 500 habits.
+the sheet is read through the local csv stand-in, its cache lives in the
+temp workdir and mail goes to a maildir, so nothing touches google, gmail
+or the repo's cache/.
+
+    python bench.py                 run the grid, print time + peak memory per stage
+    python bench.py --quick         small sizes only
+    python bench.py --record        save budgets (results x headroom) to bench_budget.json
+    python bench.py --check         exit 1 if a stage is over (or has no) recorded budget
+
+budgets are machine dependent, re-record them on the machine that runs --check.
+
+"""
+
+import os
+import sys
+import json
+import tempfile
+import argparse
+import tracemalloc
+from logging import Logger
+
+from main import HabitTracker
+from utils.dataSource import SheetSource
+from utils.synth import synthetic_sheet
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(DIR, 'bench_budget.json')
+
+# (days, habits)
+SIZES = [(7, 5), (30, 20), (365, 50), (365 * 3, 100), (3650, 50), (3650, 500)]
+QUICK_SIZES = [(7, 5), (365, 50)]
+
+# (attribute or method, its stage), in pipeline order. a step can pull in
+# nested stages (message -> charts, ...), its memory goes to its own stage
+STEPS = [('raw', 'load'), ('data', 'clean'), ('data_week', 'clean'),
+         ('streak_index', 'streaks'), ('streaks', 'streaks'), ('neg_streaks', 'streaks'),
+         ('data_summary', 'aggregate'), ('data_week_summary', 'aggregate'),
+         ('message', 'render'), ('send_email', 'deliver')]
+
+
+def make_tracker(days: int, habits: int, workdir: str) -> HabitTracker:
+    """ HabitTracker over a synthetic sheet, fresh cache, maildir delivery """
+    name = f'bench-{days}x{habits}'
+    sheet = os.path.join(workdir, f'{name}.csv')
+    if not os.path.exists(sheet):
+        synthetic_sheet(days, habits).to_csv(sheet, index=False)
+
+    config_file = os.path.join(workdir, 'config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'TEMPLATE_PATH': os.path.join(DIR, 'template.html'),
+            'from_email': 'bench@localhost',
+            'to_emails': ['bench@localhost'],
+            'email_subject': 'bench YYYY.MM.DD',
+            'mail_transport': 'maildir',
+            'maildir_path': os.path.join(workdir, 'maildir'),
+            }, f)
+    credentials_file = os.path.join(workdir, 'credentials.json')
+    with open(credentials_file, 'w', encoding='utf-8') as f:
+        json.dump({}, f)
+
+    cache_dir = os.path.join(workdir, 'cache')
+    for ext in ('pkl', 'json'):
+        cached = os.path.join(cache_dir, f'{name}.{ext}')
+        if os.path.exists(cached):
+            os.remove(cached)
+
+    ht = HabitTracker(
+        config_file=config_file,
+        credentials_file=credentials_file,
+        logger=Logger('bench'),
+        tracker={'name': name, 'gsheet_id': name, 'local_sheet': sheet},
+        )
+    # sheet cache in the workdir instead of the repo's cache/
+    ht.source = SheetSource(ht.sheet, cache_dir, name, logger=ht.logger)
+    return ht
+
+
+def run_case(days: int, habits: int, workdir: str) -> dict:
+    """ {stage: {'seconds': exclusive time, 'peak_mb': memory a step of the stage allocated at its peak}} """
+    # timing pass
+    ht = make_tracker(days, habits, workdir)
+    for step, _ in STEPS:
+        attr = getattr(ht, step)
+        if callable(attr):
+            attr()
+    result = {stage: {'seconds': seconds} for stage, seconds in ht.timings.items()}
+
+    # memory pass (tracemalloc slows everything down, so it isn't timed)
+    ht = make_tracker(days, habits, workdir)
+    stage_of = {}
+    tracemalloc.start()
+    try:
+        for step, stage in STEPS:
+            # peak above what earlier steps still hold, not the process high-water mark
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            attr = getattr(ht, step)
+            if callable(attr):
+                attr()
+            _, peak = tracemalloc.get_traced_memory()
+            stage_of[stage] = max(stage_of.get(stage, 0), peak - current)
+    finally:
+        tracemalloc.stop()
+
+    for stage, peak in stage_of.items():
+        result.setdefault(stage, {'seconds': 0.0})['peak_mb'] = peak / 1024 / 1024
+    return result
+
+
+def load_budget() -> dict:
+    if os.path.exists(BUDGET_FILE):
+        with open(BUDGET_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def main(sizes: list, record: bool = False, check: bool = False, headroom: float = 2.0) -> int:
+    budget = load_budget()
+    failures = []
+
+    print(f'{"size":<12}{"stage":<12}{"seconds":>10}{"peak MB":>10}{"budget s":>10}{"budget MB":>11}')
+    with tempfile.TemporaryDirectory() as workdir:
+        for days, habits in sizes:
+            key = f'{days}x{habits}'
+            result = run_case(days, habits, workdir)
+
+            for stage, r in result.items():
+                b = budget.get(key, {}).get(stage, {})
+                print(f'{key:<12}{stage:<12}{r["seconds"]:>10.4f}{r.get("peak_mb", 0):>10.2f}'
+                      f'{b.get("seconds", float("nan")):>10.4f}{b.get("peak_mb", float("nan")):>11.2f}')
+
+                if check and not b:
+                    failures.append(f'{key} {stage}: no budget recorded')
+                elif check:
+                    if r['seconds'] > b['seconds']:
+                        failures.append(f'{key} {stage}: {r["seconds"]:.4f}s > {b["seconds"]:.4f}s')
+                    if r.get('peak_mb', 0) > b.get('peak_mb', float('inf')):
+                        failures.append(f'{key} {stage}: {r["peak_mb"]:.2f}MB > {b["peak_mb"]:.2f}MB')
+
+            if record:
+                # floors keep tiny stages from failing on timer noise
+                budget[key] = {
+                    stage: {
+                        'seconds': round(max(r['seconds'] * headroom, 0.01), 4),
+                        'peak_mb': round(max(r.get('peak_mb', 0) * headroom, 1.0), 2),
+                    }
+                    for stage, r in result.items()
+                }
+
+    if record:
+        with open(BUDGET_FILE, 'w', encoding='utf-8') as f:
+            json.dump(budget, f, indent=4)
+        print(f'budgets saved to {BUDGET_FILE}')
+
+    if failures:
+        print('over budget / missing budgets:')
+        print(*failures, sep='\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='habit tracker benchmarks')
+    parser.add_argument('--quick', action='store_true', help='small sizes only')
+    parser.add_argument('--record', action='store_true', help='save results as the new budgets')
+    parser.add_argument('--check', action='store_true', help='fail if a stage is over budget')
+    parser.add_argument('--headroom', type=float, default=2.0, help='budget = result x headroom (with --record)')
+    args = parser.parse_args()
+
+    sys.exit(main(
+        QUICK_SIZES if args.quick else SIZES,
+        record=args.record,
+        check=args.check,
+        headroom=args.headroom,
+        ))
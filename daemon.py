@@ -0,0 +1,190 @@
+# !/bin/env python
+
+"""
+Habit Tracker Daemon
+one long running process instead of a cron job per report
+
+keeps the authorized sheets client, the parsed config / credentials (re-read
+when they change on disk), the template, each sheet's data and the smtp
+connection warm, and runs every tracker on its own cron schedule in its own
+time zone. each run does an incremental sheet refresh first.
+
+trackers file is the same as batch.py's, with two extra (optional) keys:
+    "schedule" : "0 7 * * *"          cron expression, default from config.json
+    "timezone" : "America/Chicago"    default from config.json, else UTC
+
+"""
+
+import os
+import heapq
+import signal
+import datetime
+import argparse
+import threading
+from functools import cached_property
+from logging import Logger
+from zoneinfo import ZoneInfo
+
+from main import HabitTracker, GSHEET_KEY, GSHEET_ID
+from utils.cron import CronExpression
+from utils.logMan import createLogger, timed
+from utils.dataMan import DataManager as DM
+from utils.sheetCache import authorize, open_sheet
+from utils.dataSource import DataSource, SheetSource, StreamSource
+from utils.mailMan import build_email, make_queue, MailQueue
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Daemon:
+    """ schedules and runs trackers with warm state """
+
+    def __init__(self,
+                 trackers_file: str = 'trackers.json',
+                 config_file: str = 'config.json',
+                 credentials_file: str = 'credentials.json',
+                 logger: Logger = None,
+                 ):
+        self.logger = logger
+        if self.logger == None:
+            self.logger = createLogger(root=os.path.join(DIR, 'log'), useStreamHandler=True)
+
+        self.config_file = config_file
+        self.credentials_file = credentials_file
+        self.config = DM(config_file, logger=self.logger, default={})
+        self.credentials = DM(credentials_file, logger=self.logger, default={})
+        self.trackers = DM(trackers_file, logger=self.logger, default=[]).data if trackers_file else []
+
+        self.client = None
+        self.sheets = {}
+        self.sources = {}
+        self.stop_event = threading.Event()
+
+        self.schedule = []
+        for i, tracker in enumerate(self.trackers):
+            tracker.setdefault('gsheet_id', self.config.data.get('gsheet_id', GSHEET_ID))
+            tracker.setdefault('name', f"{i}-{tracker['gsheet_id']}")
+            tracker['_cron'] = CronExpression(tracker.get('schedule', self.config.data.get('schedule', '0 7 * * *')))
+            tracker['_tz'] = ZoneInfo(tracker.get('timezone', self.config.data.get('timezone', 'UTC')))
+            heapq.heappush(self.schedule, (self.next_run(tracker), i))
+
+    @cached_property
+    def mail(self) -> MailQueue:
+        """ mail pool, opened on the first send """
+        return make_queue(self.config.data, self.credentials.data, logger=self.logger)
+
+    def close(self):
+        if 'mail' in self.__dict__:
+            self.mail.pool.close()
+
+    def next_run(self, tracker: dict, now: datetime.datetime = None) -> datetime.datetime:
+        """ next run time (utc) after now for a tracker, the cron expression is read in its own time zone """
+        tz = tracker['_tz']
+        if now == None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        local = now.astimezone(tz).replace(tzinfo=None)
+        while True:
+            local = tracker['_cron'].next_after(local)
+            # a time skipped by spring forward runs at the same offset past the gap, one repeated
+            # by fall back runs on its first pass (its second if the first is already over)
+            for fold in (0, 1):
+                due = local.replace(tzinfo=tz, fold=fold).astimezone(datetime.timezone.utc)
+                if due > now:
+                    return due
+
+    def sheet(self, tracker: dict):
+        """ worksheet handle, opened once per sheet """
+        local_sheet = tracker.get('local_sheet', self.config.data.get('local_sheet'))
+        key = (tracker['gsheet_id'], local_sheet)
+        if key not in self.sheets:
+            if local_sheet:
+                self.sheets[key] = open_sheet(None, tracker['gsheet_id'], os.path.join(DIR, local_sheet))
+            else:
+                if self.client is None:
+                    self.client = authorize(os.path.join(DIR, self.config.data.get('gsheet_key', GSHEET_KEY)))
+                self.sheets[key] = open_sheet(self.client, tracker['gsheet_id'])
+        return self.sheets[key]
+
+    def source(self, tracker: dict) -> DataSource:
+        """ data source per sheet / stream file, kept (with its parsed rows) between runs """
+        source_path = tracker.get('source_path', self.config.data.get('source_path'))
+        key = source_path or tracker['gsheet_id']
+        if key not in self.sources:
+            if source_path:
+                self.sources[key] = StreamSource(os.path.join(DIR, source_path), os.path.join(DIR, 'cache'), logger=self.logger)
+            else:
+                self.sources[key] = SheetSource(self.sheet(tracker), os.path.join(DIR, 'cache'), tracker['gsheet_id'], logger=self.logger)
+        return self.sources[key]
+
+    def refresh(self, tracker: dict):
+        """ incremental sync, the cached frame stays in memory between runs """
+        return self.source(tracker).read()
+
+    def run_tracker(self, tracker: dict) -> bool:
+        """ refresh, build and send one report, False if it could not be sent """
+        name = tracker['name']
+        with timed(self.logger, 'daemon_run', tracker=name):
+            # hot reload: only re-parsed when the files changed on disk
+            self.config.reload()
+            self.credentials.reload()
+            data = self.refresh(tracker)
+            ht = HabitTracker(
+                config_file=self.config_file,
+                credentials_file=self.credentials_file,
+                logger=self.logger,
+                tracker={k: v for k, v in tracker.items() if not k.startswith('_')},
+                data=data,
+                config=self.config,
+                credentials=self.credentials,
+                timezone=tracker.get('_tz'),
+                )
+            message = ht.run(send=False)
+            if message is None:
+                return True
+            self.mail.put(build_email(ht.config.data, message, ht.images, ht.attachments, ht.today))
+            sent = all(self.mail.flush())
+            if sent:
+                ht.save_state()
+            return sent
+
+    def stop(self, *args):
+        self.logger.info('stopping daemon')
+        self.stop_event.set()
+
+    def loop(self):
+        """ run trackers as they come due until stop() """
+        self.logger.info(f'daemon started with {len(self.trackers)} trackers')
+        while not self.stop_event.is_set() and self.schedule:
+            due, i = self.schedule[0]
+            wait = (due - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+            if wait > 0:
+                # wake up at least once a minute so clock changes don't drift the schedule
+                self.stop_event.wait(min(wait, 60))
+                continue
+
+            heapq.heappop(self.schedule)
+            tracker = self.trackers[i]
+            try:
+                self.run_tracker(tracker)
+            except Exception as e:
+                self.logger.error(f"run of {tracker['name']} failed: {e}")
+            heapq.heappush(self.schedule, (self.next_run(tracker), i))
+
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='run habit tracker reports on a schedule')
+    parser.add_argument('trackers', nargs='?', default='trackers.json')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--credentials', default='credentials.json')
+    parser.add_argument('--now', action='store_true', help='run every tracker once at startup')
+    args = parser.parse_args()
+
+    daemon = Daemon(args.trackers, args.config, args.credentials)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    if args.now:
+        for tracker in daemon.trackers:
+            daemon.run_tracker(tracker)
+    daemon.loop()
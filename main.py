@@ -5,6 +5,8 @@ My Habit Tracker
 The Black Pearl Newsletter Generator
 
 """
+from __future__ import annotations
+
 __author__ = "Justin Garza"
 __copyright__ = "Copyright 2026, Justin Garza"
 __credits__ = ["Justin Garza"]
@@ -15,43 +17,108 @@ __email__ = "Justin Garza"
 __status__ = "Development"
 
 # standard imports
-import os
-import math
-import re
-import datetime
-import requests
-import pandas as pd
-pd.set_option("future.no_silent_downcasting", True)
-
-from matplotlib.colors import LinearSegmentedColormap
+import time
+_import_start = time.perf_counter()
 
-# data stuff
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-
-import plotly.express as px
+import os
+import sys
+import copy
+import argparse
+from functools import cached_property
+from zoneinfo import ZoneInfo
+
+# heavy imports are lazy, each one is only loaded by the stage that uses it
+# (gspread/oauth2client: load, matplotlib: charts)
+from utils.lazy import lazy_import, import_times
+np = lazy_import('numpy')
+pd = lazy_import('pandas', on_load=lambda pd: pd.set_option("future.no_silent_downcasting", True))
 
 # logging
-from io import StringIO
 from logging import Logger
-from utils.logMan import createLogger
+from utils.logMan import createLogger, stage, profile, MetricsSink
 
 # data manager
 from utils.dataMan import DataManager as DM
+from utils.sheetCache import authorize, open_sheet
+from utils.dataSource import DataSource, SheetSource, StreamSource
+from utils.runState import RunState, fingerprint, config_hash
+from utils.habitData import normalize
+from utils.summary import summary_frame
+from utils.windows import WindowCounter, window_label
+from utils.charts import render_charts
+from utils.export import export_history, recent_rows
+from utils.streaks import StreakIndex
+from utils.chunked import ChunkedAggregate
+from utils.analyticsStore import AnalyticsStore
+from utils.report import Report, load_template, minify, SUMMARY_GRADIENTS
 
 # email stuff
-from email.message import EmailMessage
-import ssl
-import smtplib
+from utils.mailMan import build_email, make_transport
+
+_import_seconds = time.perf_counter() - _import_start
+
+# defaults, can be overridden per tracker with the gsheet_key / gsheet_id config keys
+GSHEET_KEY = 'jgarza-1609029185640-e61af0876b7e.json'
+# GSHEET_ID = "1gT_m6xnpEQ3YEIE44bwokKZJgsLn66nMo3MifTa4GGc"
+GSHEET_ID = "1-b4xkSDxGgpuiPN-xBg4dkJ9HeA9iGba6kx9MsiieCQ"
+
+# (min streak, tier) - highest matching tier wins
+STREAK_TIERS = [(3, '🔥 '), (6, '🌟 '), (12, '🏆 '), (15, '🚀 '), (30, '⭐⭐⭐ ')]
+NEG_STREAK_TIERS = [(3, '⚠️ '), (6, '⛔ '), (12, '❌ '), (15, '💀 '), (30, '💀💀💀 ')]
+
+
+def get_tier(streak: int, tiers: list) -> str:
+    """ Tier emoji for a streak length """
+    tier = ''
+    for minimum, emoji in tiers:
+        if streak >= minimum:
+            tier = emoji
+    return tier
+
+
+def local_today(tz=None) -> pd.Timestamp:
+    """ Today (naive midnight) in a time zone (name or tzinfo), the host's day if None """
+    if tz is None:
+        return pd.Timestamp.now().normalize()
+    if isinstance(tz, str):
+        tz = ZoneInfo(tz)
+    return pd.Timestamp.now(tz=tz).normalize().tz_localize(None)
+
+
+def report_context(config: dict, root: str, today: pd.Timestamp) -> str:
+    """ Hash of the day, the config and the template (mtime), see HabitTracker.context """
+    template = os.path.join(root, config.get('TEMPLATE_PATH', 'template.html'))
+    mtime = os.path.getmtime(template) if os.path.exists(template) else None
+    return config_hash({'today': today.strftime('%Y-%m-%d'), 'config': config, 'template': mtime})
+
 
 class HabitTracker:
-    """ Main Habit Tracker Class """
+    """
+    Main Habit Tracker Class
+
+    the report is a pipeline of lazy, memoized stages:
+        load (raw) -> clean (data) -> aggregate (summaries, streaks) -> render (message) -> deliver (send_email)
+    only the stages that are asked for are run, e.g. `HabitTracker().streaks`
+    never renders html. `run()` does the whole thing.
+    """
 
     def __init__(self, 
                  config_file: str = 'config.json',
                  credentials_file: str = 'credentials.json',
-                 logger: Logger = None
+                 logger: Logger = None,
+                 tracker: dict = None,
+                 data: pd.DataFrame = None,
+                 config: DM = None,
+                 credentials: DM = None,
+                 timezone=None,
                  ) -> None:
+        """
+        tracker: per-tracker config (gsheet_id, to_emails, ...) laid over config.json
+        data: already fetched sheet data, skips get_sheet_data()
+        config / credentials: already loaded DataManagers (kept warm by the daemon)
+        timezone: name or tzinfo that decides which day is "today" (default: the
+            'timezone' config key, else the host's local time)
+        """
 
         self.dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -64,344 +131,418 @@ class HabitTracker:
         self.logger.info("Starting Habit Tracker")
 
         self.config_file = os.path.join(self.dir,config_file)
-        self.config = DM(config_file,default={})
+        self.config = copy.copy(config) if config is not None else DM(config_file,default={})
+        if tracker:
+            self.config.data = {**self.config.data, **tracker}
 
         self.credentials_file = os.path.join(self.dir,credentials_file)
-        self.credentials = DM(credentials_file,default={})
-
-        self.gsheet_key = os.path.join(self.dir, 'jgarza-1609029185640-e61af0876b7e.json')
-        # self.gsheet_id = "1gT_m6xnpEQ3YEIE44bwokKZJgsLn66nMo3MifTa4GGc"
-        self.gsheet_id = "1-b4xkSDxGgpuiPN-xBg4dkJ9HeA9iGba6kx9MsiieCQ"
-
-        self.data = self.get_sheet_data()
-        self.data.drop(columns=['Month','Week','Year','DeltaDay','📶'], inplace=True)
-        self.data["Date"] = pd.to_datetime(self.data["Date"], errors="coerce")
-        self.data = self.data.sort_values(by="Date", ascending=False)
-
-        # print(self.data)
-
-        self.habits = self.get_habits(self.data)
-        # self.convert_to_int()
-
-        # print(self.data)
-
-        #convert Date to datetime
-        self.data["Date"] = pd.to_datetime(self.data["Date"], errors="coerce")
-
-
-        #filter 
-        today = pd.Timestamp.now().normalize()
-        # today = pd.Timestamp.now().normalize() + pd.Timedelta(days=14)
-        self.data = self.data[self.data["Date"] <= today]
-
-        last_7 = pd.Timestamp.now().normalize() - pd.Timedelta(days=6)
-        self.data_week = self.data[self.data["Date"] >= last_7]
-
-        #year bars
-        # self.bars_year = self.data[self.habits].sum().reset_index()
-        # self.bars_year.columns = ["Habit", "Sum"]
-        # self.bars_year["pSum"] = self.bars_year["Sum"].apply(lambda x: max(x,0))
-        # self.bars_year['Percent'] = self.bars_year['Sum'].apply(lambda x: f'{ max(x/len(self.data),0):.2f}%')
-        # self.bars_year['Bars'] = self.bars_year['pSum'].apply(lambda x: '|' + '█' * math.ceil((x/len(self.data))*25.0) + '░' * math.floor((1.0 - (x/len(self.data)))*25.0) + '|')
-
-
-        
-
-        self.data_summary = []
-        for habit in self.habits:
-            percent = max(self.data.loc[self.data[habit] == 1, habit].count()/len(self.data),0)
-
-            filled = '█' * int(percent*25.0)
-            empty = '░' * (25 - len(filled))
-
-            self.data_summary.append( {
-                "Habit": habit,
-                "Percent": f'{ percent*100.0:.2f}%',
-                "Bar": filled + empty,
-                "✅": int(self.data.loc[self.data[habit] == 1, habit].count()),
-                "⛔": int(self.data.loc[self.data[habit] == -1, habit].count()),
-                "🔲": int(self.data.loc[self.data[habit] == 0, habit].count()),
-            } )
-        self.data_summary = pd.DataFrame(self.data_summary)
-
-        #last week bars
-        # self.bars_week = self.data_week[self.habits].sum().reset_index()
-        # self.bars_week.columns = ["Habit", "Sum"]
-        # self.bars_week["pSum"] = self.bars_week["Sum"].apply(lambda x: max(x,0))
-        # week = min(7.0, len(self.data_week))
-        # self.bars_week['Percent'] = self.bars_week['Sum'].apply(lambda x: f'{ x/week:.2f}%')
-        # self.bars_week['Bars'] = self.bars_week['pSum'].apply(lambda x: '|' + '█' * math.ceil((x/week)*25.0) + '░'* math.floor((1.0 - (x/week))*25.0) + '|')   
-
-
-
-        self.data_week_summary = []
-        for habit in self.habits:
-            percent = max(self.data_week.loc[self.data_week[habit] == 1, habit].count()/len(self.data_week),0)
-
-            filled = '█' * int(percent*25.0)
-            empty = '░' * (25 - len(filled))
-            
-            self.data_week_summary.append( {
-                "Habit": habit,
-                "Percent": f'{ percent*100.0:.2f}%',
-                "Bar": filled + empty,
-                "✅": int(self.data_week.loc[self.data_week[habit] == 1, habit].count()),
-                "⛔": int(self.data_week.loc[self.data_week[habit] == -1, habit].count()),
-                "🔲": int(self.data_week.loc[self.data_week[habit] == 0, habit].count()),
-            } )
-        self.data_week_summary = pd.DataFrame(self.data_week_summary)
-
-        # streaks
-        self.streaks = []
-        for habit in self.habits:
-            streak = self.get_streak(self.data[habit])
-            if streak > 1:
-                tier = ''
-                if streak >= 3:
-                    tier = '🔥 '
-                if streak >= 6:
-                    tier = '🌟 '
-                if streak >= 12:
-                    tier = '🏆 '
-                if streak >= 15:
-                    tier = '🚀 '
-                if streak >= 30:
-                    tier = '⭐⭐⭐ '
-                self.streaks.append((habit, streak, tier))
-
-        #negative streaks
-        self.neg_streaks = []
-        for habit in self.habits:
-            neg_streak = self.get_neg_streak(self.data[habit])
-            if neg_streak > 1:
-                tier = ''
-                if neg_streak >= 3:
-                    tier = '⚠️ '
-                if neg_streak >= 6:
-                    tier = '⛔ '
-                if neg_streak >= 12:
-                    tier = '❌ '
-                if neg_streak >= 15:
-                    tier = '💀 '
-                if neg_streak >= 30:
-                    tier = '💀💀💀 '
-                self.neg_streaks.append((habit, neg_streak, tier))
-
-
-        # self.data.to_csv(os.path.join(self.dir,'data_year.csv'), index=False)
-
-        # print(self.data_summary)
-        # print(self.data_week_summary)
-
-        # print(self.data)
-        # print(self.habits)
-        # print(self.data_week)
-        # print(self.bars_year)
-        # print(self.bars_week)
-
-        self.message = self.create_message()
-        self.send_email()
-
-        # self.logger.info(f"{self.message=}")
-        # with open(os.path.join(self.dir,'message.html'), 'w', encoding='utf8') as f:
-        #     f.write(self.message)
-        #     f.close
-    
-    def get_sheet_data(self):
-        """ Get raw data from URL """
-        scope = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive.file"
-        ]
-        creds = ServiceAccountCredentials.from_json_keyfile_name(self.gsheet_key, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(self.gsheet_id).sheet1
-        # print(sheet.get_all_values())
-
-        return pd.DataFrame(sheet.get_all_records())
-    
-    def get_habits(self, df):
-        """ Get list of habits from data frame """
-        habits = df.columns.tolist()
-        habits.remove("Date")
-        # habits.remove("Month")
-        # habits.remove("Year")
-        return habits
-
-    
-    # def convert_to_int(self):
-    #     """ Convert habit columns to int """
-    #     for habit in self.habits:
-    #         # self.data[habit] = self.data[habit].astype(int)
-    #         # self.data[habit] = self.data[habit].map({"TRUE":1, "FALSE":0})
-    #         self.data[habit] = self.data[habit].map({"TRUE":1, "FALSE":0})
-
-
-
-    def get_streak(self, series: pd.Series) -> int:
-        """ Get current streak for a habit series (1s and 0s) """
-        streak = 0
-        for val in series:
-            if val == 1:
-                streak += 1
-            else:
-                break
-        return streak
-
-    def get_neg_streak(self, series: pd.Series) -> int:
-        """ Get current streak for a habit series (1s and 0s) """
-        streak = 0
-        for val in series:
-            if val == -1:
-                streak += 1
+        self.credentials = credentials if credentials is not None else DM(credentials_file,default={})
+
+        self.gsheet_key = os.path.join(self.dir, self.config.data.get('gsheet_key', GSHEET_KEY))
+        self.gsheet_id = self.config.data.get('gsheet_id', GSHEET_ID)
+        self.timezone = timezone if timezone is not None else self.config.data.get('timezone')
+
+        self.timings = {}
+        self._data = data
+        self._modified = None
+        self._pending_state = None
+        # 'chunk_rows': fold the source in blocks instead of loading the whole history
+        self.chunked = data is None and bool(self.config.data.get('chunk_rows'))
+        if data is not None and self.config.data.get('chunk_rows'):
+            self.logger.info('"chunk_rows" ignored, the data was passed in whole')
+
+        # per-stage metrics as json lines (see utils.logMan)
+        self.metrics = None
+        if self.config.data.get('metrics_path'):
+            self.metrics = MetricsSink(os.path.join(self.dir, self.config.data['metrics_path']))
+        self.metrics_tags = {'tracker': self.config.data.get('name', self.gsheet_id)}
+
+    def run(self, send: bool = True) -> str:
+        """
+        Run every stage, email the report if send.
+        'unchanged_policy' decides what happens when nothing changed since the last run:
+            send (default) - render and send as usual
+            resend         - send the last rendered report again, no aggregation/rendering
+            skip           - do nothing (returns None)
+        the run state is only saved once the report was sent; with send=False
+        the caller calls save_state() after delivering it
+        """
+        policy = self.config.data.get('unchanged_policy', 'send')
+        mode = self.config.data.get('profile')
+        profile_path = os.path.join(getattr(self.logger, 'dir', self.dir), 'profile.prof')
+        with profile(self.logger, mode, profile_path):
+            if policy != 'send' and self.unchanged():
+                message = None if policy == 'skip' else self.run_state.message()
+                if message is None:
+                    self.logger.info('nothing changed since the last run, skipping')
+                    return None
+                self.logger.info('nothing changed since the last run, resending the last report')
+                self.message = message
+                self.images = self.run_state.get('images', {})
+                self.attachments = self.run_state.get('attachments', {})
             else:
-                break
-        return streak
-    
-
-    
-    def table_style(self, df):
-
-        html_temp = (
-                    df
-                    .to_html(
-                        classes='table table-striped table-hover table-bordered table-responsive', 
-                        index=False,
-                        border=0
-                    )
-                )
+                if self.config.data.get('analytics_db'):
+                    self.store
+                message = self.message
+                self._pending_state = {
+                    'modified': self._modified,
+                    'fingerprint': self.data_fingerprint,
+                    'context': self.context,
+                    'images': self.images,
+                    'attachments': self.attachments,
+                    }
+            if send:
+                self.send_email()
+                self.save_state()
+        self.logger.info('stage timings: ' + ', '.join(f'{k}={v:.3f}s' for k, v in self.timings.items()))
+        return message
 
-        # html_temp = html_temp.replace(
-        #     "<table ",
-        #     "<table style='font-family: 'Roboto Mono', ui-monospace, monospace;' "
-        #     )
-        
-        return  html_temp
+    # change detection
+
+    @cached_property
+    def run_state(self) -> RunState:
+        return RunState(os.path.join(self.dir, 'cache', 'state'), self.config.data.get('name', self.gsheet_id))
+
+    def save_state(self):
+        """ remember what this run rendered, so the next one can tell if anything changed """
+        if self._pending_state is None:
+            return
+        self.run_state.save(self.message, **self._pending_state)
+        self._pending_state = None
+
+    @cached_property
+    def context(self) -> str:
+        """ Everything besides the data that changes the report: the day, the config and the template """
+        return report_context(self.config.data, self.dir, self.today)
+
+    @cached_property
+    def today(self) -> pd.Timestamp:
+        """ The report's day in the tracker's time zone """
+        return local_today(self.timezone)
+
+    @stage('detect')
+    def unchanged(self) -> bool:
+        """ True if neither the sheet nor the report context changed since the last run """
+        state = self.run_state
+        # cheap metadata check first, the sheet values aren't read if it wasn't modified
+        if self._data is None:
+            self._modified = self.source.modified_time()
+        if state.get('context') != self.context:
+            return False
+        if self._modified is not None and self._modified == state.get('modified'):
+            return True
+        return self.data_fingerprint == state.get('fingerprint')
+
+    @cached_property
+    def data_fingerprint(self) -> str:
+        if self.chunked:
+            # the tail plus the running totals stand in for the whole history
+            return fingerprint(self.data, self.totals.days, self.totals.counts.tolist(), self.totals.streaks.longest_runs.tolist())
+        return fingerprint(self.data)
+
+    # load
+
+    @cached_property
+    @stage('load', fields=lambda df: {'rows': len(df)})
+    def raw(self) -> pd.DataFrame:
+        """ Sheet data as fetched """
+        if self._data is not None:
+            return self._data
+        return self.get_sheet_data()
+
+    # clean
+
+    @cached_property
+    @stage('clean', fields=lambda df: {'rows': df.shape[0], 'habits': df.shape[1]})
+    def data(self) -> pd.DataFrame:
+        """ Habit matrix (int8 -1/0/1) indexed by Date, newest day first, nothing after today """
+        if self.chunked:
+            return self.totals.tail
+        data = normalize(self.raw)
+        return data[data.index <= self.today]
+
+    @cached_property
+    def tail_days(self) -> int:
+        """ Days a chunked run keeps in memory: enough for every window, the charts and the inline table """
+        days = [7]
+        for window in self.config.data.get('windows', []):
+            days.append(31 if window == 'mtd' else int(window))
+        all_data = self.config.data.get('all_data', 'all')
+        if all_data not in ('all', 'mtd'):
+            days.append(int(all_data))
+        if self.config.data.get('charts'):
+            days.append(self.config.data.get('chart_days', 365))
+        return max(days)
+
+    @cached_property
+    @stage('load', fields=lambda totals: {'days': totals.days, 'rows_late': totals.late})
+    def totals(self) -> ChunkedAggregate:
+        """ Running counts / streaks / tail folded from the source 'chunk_rows' rows at a time """
+        export_path = None
+        if self.config.data.get('history_attachment'):
+            root = os.path.join(self.dir, 'cache', 'history')
+            if os.path.exists(root) == False:
+                os.makedirs(root)
+            export_path = os.path.join(root, f'{self.history_name}.csv.gz')
+        totals = ChunkedAggregate(self.tail_days, today=self.today, export_path=export_path, logger=self.logger)
+        for block in self.source.blocks(int(self.config.data['chunk_rows'])):
+            totals.add(block)
+        return totals.finish()
+
+    @cached_property
+    def history_name(self) -> str:
+        """ file name (no extension) of this tracker's history attachment under cache/history """
+        name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in self.config.data.get('name', self.gsheet_id))
+        return f'habit_history-{name}'
+
+    @cached_property
+    def habits(self) -> list:
+        return self.data.columns.tolist()
+
+    @cached_property
+    def matrix(self) -> np.ndarray:
+        """ (days, habits) int8 matrix, newest day first """
+        return self.data.to_numpy()
+
+    @cached_property
+    @stage('clean')
+    def data_week(self) -> pd.DataFrame:
+        """ Last 7 days """
+        last_7 = self.today - pd.Timedelta(days=6)
+        return self.data[self.data.index >= last_7]
+
+    # aggregate
+
+    @cached_property
+    @stage('aggregate', fields=lambda df: {'habits': len(df)})
+    def data_summary(self) -> pd.DataFrame:
+        if self.chunked:
+            counts, days = self.totals.counts, self.totals.days
+        else:
+            counts, days = self.window_counter.counts(end=self.today)
+        summary = summary_frame(self.habits, counts, days)
+        summary["Best"] = self.streak_index.longest(1).to_numpy()
+        return summary
+
+    @cached_property
+    @stage('aggregate', fields=lambda df: {'habits': len(df)})
+    def data_week_summary(self) -> pd.DataFrame:
+        return self.window_summary(7)
+
+    @cached_property
+    @stage('aggregate')
+    def window_counter(self) -> WindowCounter:
+        """ Prefix sums behind every window summary """
+        return WindowCounter(self.data.index, self.matrix)
+
+    def window_summary(self, window) -> pd.DataFrame:
+        """ Summary for a window spec (number of days or 'mtd') """
+        counts, days = self.window_counter.window(window, self.today)
+        return summary_frame(self.habits, counts, days)
+
+    @cached_property
+    @stage('aggregate')
+    def window_summaries(self) -> dict:
+        """ {window: summary} for the extra 'windows' in the config (e.g. [30, 90, 365, "mtd"]) """
+        return {w: self.window_summary(w) for w in self.config.data.get('windows', []) if w != 7}
+
+    @cached_property
+    @stage('streaks')
+    def streak_index(self) -> StreakIndex:
+        """ Streak index over the whole history (built oldest day first), the folded StreakState when chunked """
+        if self.chunked:
+            return self.totals.streaks
+        return StreakIndex(self.habits, self.data.index[::-1], self.matrix[::-1])
+
+    @cached_property
+    @stage('streaks')
+    def streaks(self) -> list:
+        """ (habit, streak, tier, best) for every habit on a streak """
+        current = self.streak_index.current(1)
+        best = self.streak_index.longest(1)
+        return [
+            (habit, int(current[habit]), get_tier(int(current[habit]), STREAK_TIERS), int(best[habit]))
+            for habit in self.habits
+            if current[habit] > 1
+            ]
+
+    @cached_property
+    @stage('streaks')
+    def neg_streaks(self) -> list:
+        """ (habit, streak, tier, worst) for every habit on a negative streak """
+        current = self.streak_index.current(-1)
+        worst = self.streak_index.longest(-1)
+        return [
+            (habit, int(current[habit]), get_tier(int(current[habit]), NEG_STREAK_TIERS), int(worst[habit]))
+            for habit in self.habits
+            if current[habit] > 1
+            ]
+
+    @cached_property
+    @stage('store')
+    def store(self) -> AnalyticsStore:
+        """ Local analytics store (path from 'analytics_db'), synced with the cleaned data (not when chunked) """
+        store = AnalyticsStore(os.path.join(self.dir, self.config.data.get('analytics_db', 'analytics.db')), logger=self.logger)
+        if self.chunked:
+            # a chunked run only holds the last days, syncing them would replace the stored history
+            self.logger.warning('analytics store: not synced in chunked mode ("chunk_rows"), left as it was')
+            return store
+        store.sync(self.data)
+        return store
+
+    @cached_property
+    @stage('charts')
+    def charts(self) -> dict:
+        """ {habit: {kind: (cid, png path)}} heatmap + trend pngs, when 'charts' is on """
+        if not self.config.data.get('charts'):
+            return {}
+        return render_charts(
+            self.data,
+            cache_dir=os.path.join(self.dir, 'cache', 'charts'),
+            days=self.config.data.get('chart_days', 365),
+            workers=self.config.data.get('chart_workers'),
+            logger=self.logger,
+            )
+
+    @cached_property
+    def images(self) -> dict:
+        """ {cid: png path} for the inline attachments """
+        return {cid: path for kinds in self.charts.values() for cid, path in kinds.values()}
+
+    @cached_property
+    def attachments(self) -> dict:
+        """ {filename: path}, the full history as csv.gz when 'history_attachment' is on """
+        if not self.config.data.get('history_attachment'):
+            return {}
+        if self.chunked:
+            # written oldest day first while folding
+            return {'habit_history.csv.gz': self.totals.export_path}
+        path = export_history(self.data, os.path.join(self.dir, 'cache', 'history'), self.history_name)
+        return {'habit_history.csv.gz': path}
+
+    # render
+
+    @cached_property
+    def message(self) -> str:
+        return self.create_message()
+
+    def open_sheet(self):
+        """ Open the worksheet (or the local csv stand-in if 'local_sheet' is set) """
+        local_sheet = self.config.data.get('local_sheet')
+        if local_sheet:
+            return open_sheet(None, self.gsheet_id, os.path.join(self.dir, local_sheet))
+        return open_sheet(authorize(self.gsheet_key), self.gsheet_id)
+
+    @cached_property
+    def sheet(self):
+        return self.open_sheet()
+
+    @cached_property
+    def source(self) -> DataSource:
+        """ 'source_path' (.jsonl / .csv, read incrementally) if set, else the sheet """
+        source_path = self.config.data.get('source_path')
+        if source_path:
+            return StreamSource(os.path.join(self.dir, source_path), os.path.join(self.dir, 'cache'), logger=self.logger)
+        return SheetSource(self.sheet, os.path.join(self.dir, 'cache'), self.gsheet_id, logger=self.logger)
 
+    def get_sheet_data(self):
+        """ Get the raw data, only pulling the rows added since the last run """
+        return self.source.read()
+    
     def table_style_summary(self, df):
-        cmap_wg = LinearSegmentedColormap.from_list("white_green", ["white",  "#4dff88"])
-        cmap_wr = LinearSegmentedColormap.from_list("white_red", ["white",  "#ff4d4d"])
-        html_temp = (
-                    df.style
-                    .background_gradient(cmap=cmap_wg, subset=["Passed" ])
-                    .background_gradient(cmap=cmap_wr, subset=["Failed" ])
-                    .to_html(
-                        classes='table table-striped table-hover table-bordered table-responsive', 
-                        index=False,
-                        border=0
-                    )
-                )
-        
-        return html_temp
+        """ summary table html with ✅/⛔/🔲 shaded by count """
+        report = Report(compact=self.config.data.get('compact_html', False))
+        report.table(df, gradient=SUMMARY_GRADIENTS)
+        return report.render()
 
+    @stage('render', fields=lambda html: {'bytes': len(html)})
     def create_message(self):
-        template = ''
-        with open(os.path.join(self.dir,self.config.data['TEMPLATE_PATH']), 'r', encoding='utf8') as f:
-            template = f.read()
-
-        content = ''
-
+        template = load_template(os.path.join(self.dir,self.config.data['TEMPLATE_PATH']))
+        report = Report(template, compact=self.config.data.get('compact_html', False))
+        shade = SUMMARY_GRADIENTS if self.config.data.get('summary_gradient', False) else None
 
+        # td text-align:left comes from the template's css
         if len(self.streaks) > 0:
-            content += '<h2>**Streaks**</h2>'
-            content += '<table style="font-size: 18px;"  class="dataframe table table-striped table-hover table-bordered table-responsive">'
-            for habit, streak, tier in self.streaks:
-                content += f'''
-                <tr>
-                    <td><b>{habit}</b></td>
-                    <td style="text-align:left">{streak} days   {tier}</td>
-                </tr>
-                '''
-            content += '</table>'
-            content += '<hr>'
-
+            report.heading('**Streaks**')
+            report.start_table(large=True)
+            for habit, streak, tier, best in self.streaks:
+                report.write(f'<tr><td><b>{habit}</b></td><td>{streak} days   {tier}</td><td>best: {best} days</td></tr>')
+            report.write('</table>')
+            report.rule()
 
         if len(self.neg_streaks) > 0:
-            content += '<div class=".text-danger">'
-            content += '<h2>!!Negative Streaks!!</h2>'
-            content += '<table style="font-size: 18px;"  class="dataframe table table-striped table-hover table-bordered table-responsive">'
-            for habit, streak, tier in self.neg_streaks:
-                content += f'''
-                <tr>
-                    <td><b>{habit}</b></td>
-                    <td style="text-align:left">-{streak} days   {tier}</td>
-                </tr>
-                '''
-            content += '</table>'
-            content += '</div>'
-            content += '<hr>'
-
-        content += '<h2>Habit - Last 7 Days</h2>'
-
-        # content += self.bars_week[["Habit","Sum", "Percent","Bars"]].to_html(
-        #                         classes='table table-striped table-hover table-bordered table-responsive', 
-        #                         index=False,
-        #                         border=0
-        #                         )
-        # content += self.bars_week[["Habit","Sum"]].to_html(
-        #                         classes='table table-striped table-hover table-bordered table-responsive', 
-        #                         index=False,
-        #                         border=0
-        #                         )
-
-
-        content += self.table_style(self.data_week_summary)
-        content += '<hr>'
-        temp = self.table_style(self.data_week)
-        temp = temp.replace('>-1</td>'," style=\"background-color:#ff4d4d;color:white;\">-1</td>")
-        temp = temp.replace('>0</td>',"  style=\"background-color:#eeeeee;color:black;\">0</td>")
-        temp = temp.replace('>1</td>',"  style=\"background-color:#4dff88;color:black;\">1</td>")
-
-        content += temp
-        content += '<hr>'
-
-        content += '<h2>Habit - All Data</h2>'
-        # content += self.bars_year[["Habit","Sum", "Percent","Bars"]].to_html(
-        #                         classes='table table-striped table-hover table-bordered table-responsive', 
-        #                         index=False,
-        #                         border=0
-        #                         )
-        # content += self.bars_year[["Habit","Sum"]].to_html(
-        #                         classes='table table-striped table-hover table-bordered table-responsive', 
-        #                         index=False,
-        #                         border=0
-        #                         )
-
-        content += self.table_style(self.data_summary)
-        content += '<hr>'
-        temp = self.table_style(self.data)
-
-        temp = temp.replace('>-1</td>'," style=\"background-color:#ff4d4d;color:white;\">-1</td>")
-        temp = temp.replace('>0</td>',"  style=\"background-color:#eeeeee;color:black;\">0</td>")
-        temp = temp.replace('>1</td>',"  style=\"background-color:#4dff88;color:black;\">1</td>")
-
-        content += temp
-        content += '<hr>'
-
-        message = template.replace('{{content}}', content)
-        return message
-
+            report.write('<div>' if report.compact else '<div class=".text-danger">')
+            report.heading('!!Negative Streaks!!')
+            report.start_table(large=True)
+            for habit, streak, tier, worst in self.neg_streaks:
+                report.write(f'<tr><td><b>{habit}</b></td><td>-{streak} days   {tier}</td><td>worst: -{worst} days</td></tr>')
+            report.write('</table>')
+            report.write('</div>')
+            report.rule()
+
+        report.heading('Habit - Last 7 Days')
+        report.table(self.data_week_summary, gradient=shade)
+        report.rule()
+        report.table(self.data_week, colour=self.habits, index=True)
+        report.rule()
+
+        for window, summary in self.window_summaries.items():
+            report.heading(f'Habit - {window_label(window)}')
+            report.table(summary, gradient=shade)
+            report.rule()
+
+        if len(self.charts) > 0:
+            report.heading('Habit - Charts')
+            report.start_table()
+            for habit, kinds in self.charts.items():
+                report.write(f'<tr><td><b>{habit}</b></td>')
+                for kind in ('heatmap', 'trend'):
+                    cid, _ = kinds[kind]
+                    report.write(f'<td><img src="cid:{cid}" alt="{habit} {kind}"></td>')
+                report.write('</tr>')
+            report.write('</table>')
+            report.rule()
+
+        # inline only the 'all_data' window (days, 'mtd' or 'all'), the rest is in the attachment
+        window = self.config.data.get('all_data', 'all')
+        if window == 'all' and self.chunked:
+            window = self.tail_days
+        report.heading('Habit - All Data')
+        report.table(self.data_summary, gradient=shade)
+        report.rule()
+        if window != 'all':
+            note = ', full history attached' if len(self.attachments) > 0 else ''
+            report.write(f'<p>{window_label(window)}{note}</p>')
+        report.table(recent_rows(self.data, window, self.today), colour=self.habits, index=True)
+        report.rule()
+
+        html = report.render()
+        if self.config.data.get('minify_html', False):
+            html = minify(html)
+        return html
+
+    @stage('deliver')
     def send_email(self):
-        
-        today = datetime.datetime.now().strftime("%Y.%m.%d")
+        em = build_email(self.config.data, self.message, self.images, self.attachments, self.today)
+        with make_transport(self.config.data, self.credentials.data) as transport:
+            transport.send(em)
 
-        em = EmailMessage()
-        em['From'] = self.config.data["from_email"]
-        em['To'] = ",".join(self.config.data["to_emails"])
-        em['Subject'] = self.config.data["email_subject"].replace("YYYY.MM.DD", today)
+def profile_startup():
+    """ Print what each import costs at startup """
+    print(f'{"main.py imports (eager)":<36}{_import_seconds*1000:10.1f} ms')
+    for name, seconds in import_times().items():
+        print(f'{name + " (lazy)":<36}{seconds*1000:10.1f} ms')
 
-        body = self.message
-        # body = str(self.data)
-        em.set_content(body, subtype='html')
 
-        context = ssl.create_default_context()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='habit tracker report')
+    parser.add_argument('--profile-startup', action='store_true', help='report import times and exit')
+    args = parser.parse_args()
 
-        with smtplib.SMTP_SSL('smtp.gmail.com',465,context=context) as smtp:
-            smtp.login(self.credentials.data['Email_USER'],
-                       self.credentials.data['Email_PWD']
-                       )
-            smtp.send_message(em) 
+    if args.profile_startup:
+        profile_startup()
+        sys.exit(0)
 
-if __name__ == '__main__':
     HT = HabitTracker()
+    HT.run()
     
@@ -0,0 +1,281 @@
+# !/bin/env python
+
+"""
+Habit Tracker Server
+serves the reports over http instead of (or next to) emailing them
+
+    python server.py trackers.json --port 8080
+
+    GET /                      tracker names
+    GET /<name>                html report (mobile friendly, same as the email)
+    GET /<name>.json           summaries + streaks
+    GET /<name>.txt            plain text view for a terminal (curl)
+    GET /<name>/img/<cid>      chart pngs referenced by the html
+
+every view of a tracker is rendered once and cached. a request checks the
+source's modified time and the report context (day, config, template) at
+most every 'server_check_interval' seconds, and only when one of them moved
+is the data re-read; the views are rebuilt only if the fingerprint of the
+data and context changed. rebuilds run in a thread pool, one per tracker at
+a time, and every reader waiting on a tracker gets the same result.
+
+"""
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import threading
+from logging import Logger
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+
+from main import HabitTracker, report_context, local_today
+from daemon import Daemon
+from utils.runState import fingerprint
+from utils.windows import window_label
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'json': 'application/json',
+    'txt': 'text/plain; charset=utf-8',
+    'png': 'image/png',
+}
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class View:
+    """ one rendered response body, with its gzip copy and etag """
+
+    def __init__(self, body: bytes, kind: str, etag: str):
+        self.body = body
+        self.kind = kind
+        self.etag = etag
+        # only text is worth compressing
+        self.gzipped = gzip.compress(body, compresslevel=6) if kind != 'png' else None
+
+
+def text_report(ht: HabitTracker) -> str:
+    """ terminal view: streaks and the summary tables as plain text """
+    lines = [f"Habit Tracker - {ht.config.data.get('name', ht.gsheet_id)}", '']
+    for title, streaks, sign, label in (('Streaks', ht.streaks, '', 'best'), ('Negative Streaks', ht.neg_streaks, '-', 'worst')):
+        if len(streaks) > 0:
+            lines.append(title)
+            for habit, streak, tier, best in streaks:
+                lines.append(f'  {habit}  {sign}{streak} days {tier}  ({label}: {sign}{best})')
+            lines.append('')
+    lines += ['Last 7 Days', ht.data_week_summary.to_string(index=False), '']
+    for window, summary in ht.window_summaries.items():
+        lines += [window_label(window), summary.to_string(index=False), '']
+    lines += ['All Data', ht.data_summary.to_string(index=False), '']
+    return '\n'.join(lines)
+
+
+def json_report(ht: HabitTracker) -> dict:
+    streak = lambda rows, key: [dict(zip(('habit', 'days', 'tier', key), row)) for row in rows]
+    return {
+        'name': ht.config.data.get('name', ht.gsheet_id),
+        'days': len(ht.data),
+        'last_date': ht.data.index.max().strftime('%Y-%m-%d') if len(ht.data) else None,
+        'streaks': streak(ht.streaks, 'best'),
+        'neg_streaks': streak(ht.neg_streaks, 'worst'),
+        'week': ht.data_week_summary.to_dict('records'),
+        'windows': {str(w): s.to_dict('records') for w, s in ht.window_summaries.items()},
+        'all': ht.data_summary.to_dict('records'),
+    }
+
+
+class ReportServer(Daemon):
+    """ http front end over the daemon's warm sources """
+
+    def __init__(self,
+                 trackers_file: str = 'trackers.json',
+                 config_file: str = 'config.json',
+                 credentials_file: str = 'credentials.json',
+                 workers: int = 4,
+                 logger: Logger = None,
+                 ):
+        super().__init__(trackers_file, config_file, credentials_file, logger)
+        self.by_name = {t['name']: t for t in self.trackers}
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.check_interval = self.config.data.get('server_check_interval', 5)
+
+        # name -> {'checked': time, 'modified': marker, 'context': ..., 'fingerprint': ..., 'views': {key: View}}
+        self.cache = {}
+        self.locks = {}
+        # sources (sheet caches / stream offsets) aren't thread safe
+        self.source_lock = threading.Lock()
+
+    def build(self, name: str, entry: dict) -> dict:
+        """ (executor) re-read the data if it or the context changed and re-render if the fingerprint moved """
+        tz = self.by_name[name]['_tz']
+        tracker = {k: v for k, v in self.by_name[name].items() if not k.startswith('_')}
+        self.config.reload()
+        self.credentials.reload()
+        # a new day moves the week / window views even without new data
+        context = report_context({**self.config.data, **tracker}, DIR, local_today(tz))
+
+        with self.source_lock:
+            source = self.source(tracker)
+            modified = source.modified_time()
+            if entry is not None and modified is not None and modified == entry['modified'] and context == entry['context']:
+                return {**entry, 'checked': time.time()}
+            data = source.read()
+
+        ht = HabitTracker(
+            config_file=self.config_file,
+            credentials_file=self.credentials_file,
+            logger=self.logger,
+            tracker=tracker,
+            data=data,
+            config=self.config,
+            credentials=self.credentials,
+            timezone=tz,
+            )
+        fp = fingerprint(ht.data, ht.context)
+        if entry is not None and fp == entry['fingerprint']:
+            return {**entry, 'checked': time.time(), 'modified': modified, 'context': context}
+
+        start = time.perf_counter()
+        etag = f'"{fp[:20]}"'
+        html = ht.message.replace('src="cid:', f'src="/{name}/img/')
+        views = {
+            'html': View(html.encode(), 'html', etag),
+            'json': View(json.dumps(json_report(ht), ensure_ascii=False, default=str, indent=1).encode(), 'json', etag),
+            'txt': View(text_report(ht).encode(), 'txt', etag),
+        }
+        for cid, path in ht.images.items():
+            with open(path, 'rb') as f:
+                views[f'img/{cid}'] = View(f.read(), 'png', f'"{cid}"')
+        self.logger.info(f'server: rendered {name} in {time.perf_counter() - start:.3f}s')
+        return {'checked': time.time(), 'modified': modified, 'context': context, 'fingerprint': fp, 'views': views}
+
+    async def views(self, name: str) -> dict:
+        """ cached views of a tracker, refreshed when due (one refresh per tracker at a time) """
+        entry = self.cache.get(name)
+        if entry is not None and time.time() - entry['checked'] < self.check_interval:
+            return entry['views']
+        lock = self.locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # someone else may have refreshed it while we waited
+            entry = self.cache.get(name)
+            if entry is None or time.time() - entry['checked'] >= self.check_interval:
+                loop = asyncio.get_running_loop()
+                entry = await loop.run_in_executor(self.executor, self.build, name, entry)
+                self.cache[name] = entry
+        return entry['views']
+
+    async def route(self, path: str):
+        """ -> (status, View or None) """
+        path = unquote(path.split('?', 1)[0]).strip('/')
+        if path == '':
+            body = json.dumps(sorted(self.by_name), ensure_ascii=False).encode()
+            return 200, View(body, 'json', None)
+
+        name, key = path, 'html'
+        if '/img/' in path:
+            name, cid = path.split('/img/', 1)
+            key = f'img/{cid}'
+        else:
+            base, _, ext = path.rpartition('.')
+            if base and ext in ('html', 'json', 'txt'):
+                name, key = base, ext
+        if name not in self.by_name:
+            return 404, None
+        view = (await self.views(name)).get(key)
+        return (200, view) if view is not None else (404, None)
+
+    async def respond(self, writer, status: int, view: View = None, head: bool = False, gzip_ok: bool = False, keep_alive: bool = True):
+        headers = [f'HTTP/1.1 {status} {REASONS.get(status, "")}']
+        body = b''
+        if view is not None and status == 200:
+            body = view.body
+            headers.append(f'Content-Type: {CONTENT_TYPES[view.kind]}')
+            if view.etag:
+                headers.append(f'ETag: {view.etag}')
+            if gzip_ok and view.gzipped is not None:
+                body = view.gzipped
+                headers.append('Content-Encoding: gzip')
+            headers.append('Vary: Accept-Encoding')
+        elif status != 304:
+            body = REASONS.get(status, '').encode()
+        headers.append(f'Content-Length: {len(body)}')
+        headers.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        if not head:
+            writer.write(body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """ one connection, http/1.1 keep-alive, GET / HEAD only """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(reader.readline(), timeout=15)
+                except asyncio.TimeoutError:
+                    break
+                if not request:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                parts = request.decode('latin-1').split()
+                keep_alive = headers.get('connection', '').lower() != 'close' and parts[-1:] == ['HTTP/1.1']
+                if len(parts) != 3:
+                    await self.respond(writer, 400, keep_alive=False)
+                    break
+                method, path, _ = parts
+                if method not in ('GET', 'HEAD'):
+                    await self.respond(writer, 405, keep_alive=keep_alive)
+                else:
+                    try:
+                        status, view = await self.route(path)
+                    except Exception as e:
+                        self.logger.error(f'server: {path} failed: {e}')
+                        status, view = 500, None
+                    if status == 200 and view.etag and headers.get('if-none-match') == view.etag:
+                        status = 304
+                    await self.respond(
+                        writer, status, view,
+                        head=method == 'HEAD',
+                        gzip_ok='gzip' in headers.get('accept-encoding', ''),
+                        keep_alive=keep_alive,
+                        )
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        server = await asyncio.start_server(self.handle, host, port, backlog=512)
+        self.logger.info(f'serving {len(self.by_name)} trackers on http://{host}:{port}')
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='serve habit tracker reports over http')
+    parser.add_argument('trackers', nargs='?', default='trackers.json')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--credentials', default='credentials.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4, help='threads for reading / rendering')
+    args = parser.parse_args()
+
+    server = ReportServer(args.trackers, args.config, args.credentials, args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
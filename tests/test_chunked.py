@@ -0,0 +1,127 @@
+import os
+import gzip
+import json
+from logging import Logger
+
+import numpy as np
+import pandas as pd
+
+from main import HabitTracker
+from utils.analyticsStore import AnalyticsStore
+from utils.chunked import ChunkedAggregate
+from utils.dataSource import StreamSource
+from utils.habitData import normalize
+from utils.streaks import StreakIndex
+from utils.synth import synthetic_sheet
+from utils.windows import WindowCounter
+
+TODAY = pd.Timestamp('2026-10-18')
+
+
+def raw_history():
+    """ a sheet ending a few days before TODAY, with same-day duplicates and missing days """
+    raw = synthetic_sheet(400, 6, end='2026-10-15', seed=7)
+    rng = np.random.default_rng(1)
+    dups = raw.sample(60, random_state=2).copy()
+    dups[raw.columns[1:7]] = rng.choice([-1, 0, 1], size=(60, 6))
+    raw = pd.concat([raw, dups]).sort_values('Date', kind='stable')
+    return raw.drop(raw.index[100:130]).reset_index(drop=True)
+
+
+def full(raw):
+    data = normalize(raw)
+    return data[data.index <= TODAY]
+
+
+def fold(raw, block_rows, tail_days=90, **kwargs):
+    totals = ChunkedAggregate(tail_days, today=TODAY, **kwargs)
+    for start in range(0, len(raw), block_rows):
+        totals.add(raw.iloc[start:start + block_rows])
+    return totals.finish()
+
+
+def test_chunked_matches_the_full_aggregation():
+    raw = raw_history()
+    data = full(raw)
+    counts, days = WindowCounter(data.index, data.to_numpy()).counts(end=TODAY)
+    streaks = StreakIndex(data.columns, data.index[::-1], data.to_numpy()[::-1])
+
+    for block_rows in (1, 7, 64, 1000):
+        totals = fold(raw, block_rows)
+        assert totals.habits == data.columns.tolist()
+        assert totals.days == days
+        assert totals.counts.tolist() == counts.tolist()
+        assert totals.late == 0
+        for value in (-1, 1):
+            assert totals.streaks.current(value).tolist() == streaks.current(value).tolist()
+            assert totals.streaks.longest(value).tolist() == streaks.longest(value).tolist()
+        pd.testing.assert_frame_equal(totals.tail, data.iloc[:90], check_freq=False)
+
+
+def test_habit_added_later_counts_as_0_before():
+    raw = raw_history()
+    raw['🆕'] = np.where(np.arange(len(raw)) > 300, 1, np.nan)
+    data = full(raw)
+    counts, _ = WindowCounter(data.index, data.to_numpy()).counts(end=TODAY)
+
+    early = raw.drop(columns='🆕').iloc[:300]
+    late = raw.iloc[300:]
+    totals = ChunkedAggregate(90, today=TODAY)
+    totals.add(early)
+    totals.add(late)
+    totals.finish()
+
+    assert totals.habits == data.columns.tolist()
+    assert totals.counts.tolist() == counts.tolist()
+
+
+def test_export_has_every_day_oldest_first(tmp_path):
+    raw = raw_history()
+    data = full(raw)
+    path = str(tmp_path / 'history.csv.gz')
+    fold(raw, 50, export_path=path)
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        exported = pd.read_csv(f, index_col='Date', parse_dates=['Date'])
+    expected = data.iloc[::-1]
+    assert exported.index.tolist() == expected.index.tolist()
+    assert exported.to_numpy().tolist() == expected.to_numpy().tolist()
+
+
+def test_rows_older_than_folded_days_are_counted_as_late():
+    raw = raw_history()
+    shuffled = pd.concat([raw.iloc[200:], raw.iloc[:5]])
+    totals = fold(shuffled, 50)
+    assert totals.late > 0
+
+
+def test_chunked_run_leaves_the_analytics_store_alone(tmp_path):
+    raw = raw_history()
+    data = full(raw)
+    db = str(tmp_path / 'analytics.db')
+    store = AnalyticsStore(db)
+    store.sync(data)
+    before = store.query('SELECT COUNT(DISTINCT date) AS days, COUNT(*) AS n FROM habit_values').iloc[0].tolist()
+    store.close()
+    assert before[0] == len(data) > 90
+
+    source = str(tmp_path / 'history.csv')
+    raw.to_csv(source, index=False)
+    config = str(tmp_path / 'config.json')
+    with open(config, 'w', encoding='utf-8') as f:
+        json.dump({
+            'TEMPLATE_PATH': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'template.html'),
+            'to_emails': [],
+            'email_subject': 'test YYYY.MM.DD',
+            'analytics_db': db,
+            'chunk_rows': 50,
+            }, f)
+    ht = HabitTracker(config_file=config, credentials_file=config, logger=Logger('test'), timezone='UTC')
+    ht.source = StreamSource(source, str(tmp_path / 'cache'), logger=ht.logger)
+    ht.today = TODAY
+    assert ht.chunked
+    ht.run(send=False)
+
+    # the run only held the last 90 days, the store still has all of them
+    after = ht.store.query('SELECT COUNT(DISTINCT date) AS days, COUNT(*) AS n FROM habit_values').iloc[0].tolist()
+    assert after == before
@@ -0,0 +1,104 @@
+import datetime
+from logging import Logger
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from daemon import Daemon
+from utils.cron import CronExpression
+
+UTC = datetime.timezone.utc
+
+
+def at(*args, tz=None):
+    return datetime.datetime(*args, tzinfo=tz)
+
+
+def test_sunday_is_0_or_7():
+    assert CronExpression('0 0 * * 0').weekdays == {6}
+    assert CronExpression('0 0 * * 7').weekdays == {6}
+    # 2026-10-18 is a sunday
+    assert CronExpression('0 9 * * 7').next_after(at(2026, 10, 14, 12)) == at(2026, 10, 18, 9)
+
+
+def test_ranges_steps_and_lists():
+    cron = CronExpression('*/15 8-10 1,15 * 1-5/2')
+    assert cron.minutes == {0, 15, 30, 45}
+    assert cron.hours == {8, 9, 10}
+    assert cron.days == {1, 15}
+    # mon, wed, fri
+    assert cron.weekdays == {0, 2, 4}
+
+    assert CronExpression('5/20 * * * *').minutes == {5, 25, 45}
+    assert CronExpression('0 0-23/6 * * *').hours == {0, 6, 12, 18}
+    assert CronExpression('0 7 * * 1-5').next_after(at(2026, 10, 16, 7)) == at(2026, 10, 19, 7)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '* 5-2 * * *', '*/0 * * * *', '* * * * 8'])
+def test_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_day_of_month_or_day_of_week():
+    # only one day field restricted: that one decides
+    assert CronExpression('0 0 13 * *').next_after(at(2026, 10, 1)) == at(2026, 10, 13)
+    assert CronExpression('0 0 * * 5').next_after(at(2026, 10, 1)) == at(2026, 10, 2)
+    # both restricted: either one matches (the 13th or any friday)
+    cron = CronExpression('0 0 13 * 5')
+    assert cron.next_after(at(2026, 10, 1)) == at(2026, 10, 2)
+    assert cron.next_after(at(2026, 10, 9, 12)) == at(2026, 10, 13)
+
+
+def test_never_matches():
+    with pytest.raises(ValueError):
+        CronExpression('0 0 31 2 *').next_after(at(2026, 1, 1))
+
+
+def make_daemon(tmp_path, schedule, timezone):
+    for name in ('config.json', 'credentials.json'):
+        (tmp_path / name).write_text('{}')
+    daemon = Daemon(
+        trackers_file=None,
+        config_file=str(tmp_path / 'config.json'),
+        credentials_file=str(tmp_path / 'credentials.json'),
+        logger=Logger('test'),
+        )
+    tracker = {'_cron': CronExpression(schedule), '_tz': ZoneInfo(timezone)}
+    return daemon, tracker
+
+
+def test_next_run_in_the_trackers_time_zone(tmp_path):
+    daemon, tracker = make_daemon(tmp_path, '0 7 * * *', 'Asia/Tokyo')
+    assert daemon.next_run(tracker, at(2026, 10, 18, 21, tz=UTC)) == at(2026, 10, 18, 22, tz=UTC)
+
+
+def test_next_run_across_spring_forward(tmp_path):
+    # chicago skips 02:00-03:00 on 2026-03-08
+    daemon, tracker = make_daemon(tmp_path, '0 7 * * *', 'America/Chicago')
+    first = daemon.next_run(tracker, at(2026, 3, 7, 12, tz=UTC))
+    assert first == at(2026, 3, 7, 13, tz=UTC)
+    # still 07:00 local the day after, which is an hour earlier in utc
+    assert daemon.next_run(tracker, first) == at(2026, 3, 8, 12, tz=UTC)
+
+    # a time that doesn't exist that day runs once, an hour later on the new clock, then as usual
+    daemon, tracker = make_daemon(tmp_path, '30 2 * * *', 'America/Chicago')
+    skipped = daemon.next_run(tracker, at(2026, 3, 8, 7, tz=UTC))
+    assert skipped == at(2026, 3, 8, 8, 30, tz=UTC)
+    assert skipped.astimezone(tracker['_tz']).hour == 3
+    assert daemon.next_run(tracker, skipped) == at(2026, 3, 9, 7, 30, tz=UTC)
+
+
+def test_next_run_across_fall_back(tmp_path):
+    # chicago repeats 01:00-02:00 on 2026-11-01: 06:00-07:00 utc (CDT), then 07:00-08:00 utc (CST)
+    daemon, tracker = make_daemon(tmp_path, '30 1 * * *', 'America/Chicago')
+    first = daemon.next_run(tracker, at(2026, 11, 1, 5, tz=UTC))
+    assert first == at(2026, 11, 1, 6, 30, tz=UTC)
+    # runs once that day, not again on the repeated 01:30
+    assert daemon.next_run(tracker, first) == at(2026, 11, 2, 7, 30, tz=UTC)
+
+    # started during the repeated hour, after the first 01:30 went by: the second pass is next, not the past
+    assert daemon.next_run(tracker, at(2026, 11, 1, 7, 10, tz=UTC)) == at(2026, 11, 1, 7, 30, tz=UTC)
+
+    daemon, tracker = make_daemon(tmp_path, '0 7 * * *', 'America/Chicago')
+    assert daemon.next_run(tracker, at(2026, 10, 31, 12, tz=UTC)) == at(2026, 11, 1, 13, tz=UTC)
@@ -0,0 +1,123 @@
+import json
+from logging import Logger
+
+import pandas as pd
+import pytest
+
+from utils.dataSource import StreamSource
+
+
+def make_source(tmp_path, name):
+    source = StreamSource(str(tmp_path / name), str(tmp_path / 'cache'), logger=Logger('test'))
+    # record how many lines each read hands to the parser
+    parsed = []
+    parse = source._parse
+
+    def counting(lines, header):
+        parsed.append(len(lines))
+        return parse(lines, header)
+
+    source._parse = counting
+    return source, parsed
+
+
+def jsonl(*rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+def append(path, text):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_append_then_resume(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(jsonl({'Date': '2026-10-01', 'run': 1}, {'Date': '2026-10-02', 'run': 0}))
+    source, parsed = make_source(tmp_path, 'log.jsonl')
+    assert len(source.read()) == 2
+
+    append(path, jsonl({'Date': '2026-10-03', 'run': 1}))
+    data = source.read()
+    assert list(data['run']) == [1, 0, 1]
+    assert parsed == [2, 1]
+
+    # a new source over the same root resumes from the saved offset
+    source, parsed = make_source(tmp_path, 'log.jsonl')
+    append(path, jsonl({'Date': '2026-10-04', 'run': 0}))
+    data = source.read()
+    assert list(data['Date']) == ['2026-10-01', '2026-10-02', '2026-10-03', '2026-10-04']
+    assert parsed == [1]
+
+    # nothing new: nothing parsed, same rows
+    assert len(source.read()) == 4
+    assert parsed == [1, 0]
+
+
+def test_half_written_line_is_left_for_the_next_read(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(jsonl({'Date': '2026-10-01', 'run': 1}) + '{"Date": "2026-10-02", "ru')
+    source, parsed = make_source(tmp_path, 'log.jsonl')
+    assert len(source.read()) == 1
+    assert source.meta['offset'] == len(jsonl({'Date': '2026-10-01', 'run': 1}))
+
+    append(path, 'n": 0}\n')
+    data = source.read()
+    assert list(data['run']) == [1, 0]
+    assert parsed == [1, 1]
+
+
+def test_half_written_csv_row(tmp_path):
+    path = tmp_path / 'log.csv'
+    path.write_text('Date,run,read\n2026-10-01,1,0\n2026-10-02,1')
+    source, _ = make_source(tmp_path, 'log.csv')
+    assert len(source.read()) == 1
+
+    append(path, ',1\n')
+    data = source.read()
+    assert list(data.columns) == ['Date', 'run', 'read']
+    assert list(data['read']) == [0, 1]
+
+
+def test_truncated_file_is_parsed_again(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(jsonl(*({'Date': f'2026-10-{d:02}', 'run': 1} for d in range(1, 6))))
+    source, parsed = make_source(tmp_path, 'log.jsonl')
+    assert len(source.read()) == 5
+
+    # same first line, but shorter than the saved offset
+    path.write_text(jsonl({'Date': '2026-10-01', 'run': 1}, {'Date': '2026-10-02', 'run': 0}))
+    data = source.read()
+    assert list(data['run']) == [1, 0]
+    assert parsed == [5, 2]
+
+
+def test_rewritten_file_is_parsed_again(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(jsonl({'Date': '2026-10-01', 'run': 1}, {'Date': '2026-10-02', 'run': 1}))
+    source, parsed = make_source(tmp_path, 'log.jsonl')
+    source.read()
+
+    # rotated: as long as before, different first line
+    path.write_text(jsonl({'Date': '2026-10-08', 'run': 0}, {'Date': '2026-10-09', 'run': 0}, {'Date': '2026-10-10', 'run': 1}))
+    data = source.read()
+    assert list(data['Date']) == ['2026-10-08', '2026-10-09', '2026-10-10']
+    assert parsed == [2, 3]
+
+
+@pytest.mark.parametrize('name', ['log.csv', 'log.jsonl'])
+def test_csv_and_jsonl_read_the_same(tmp_path, name):
+    rows = [{'Date': f'2026-10-{d:02}', 'run': d % 2, 'read': 1} for d in range(1, 8)]
+    if name.endswith('.csv'):
+        pd.DataFrame(rows).to_csv(tmp_path / name, index=False)
+    else:
+        (tmp_path / name).write_text(jsonl(*rows))
+    source, _ = make_source(tmp_path, name)
+
+    data = source.read()
+    assert source.kind == name.split('.')[1]
+    pd.testing.assert_frame_equal(data, pd.DataFrame(rows))
+
+    # blocks give the same rows, csv blocks after the first keep the header
+    blocks = list(source.blocks(block_rows=3))
+    assert [len(b) for b in blocks] == ([2, 3, 2] if source.kind == 'csv' else [3, 3, 1])
+    pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), pd.DataFrame(rows))
@@ -0,0 +1,72 @@
+import time
+
+from utils.jobQueue import JobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / 'jobs.db'), **kwargs)
+
+
+def test_expired_lease_is_claimed_by_another_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.put({'name': 'a'})
+
+    job = queue.claim('w1', lease=0.05)
+    assert job['id'] == job_id and job['attempts'] == 1
+    assert queue.claim('w2', lease=60) is None
+
+    time.sleep(0.1)
+    job = queue.claim('w2', lease=60)
+    assert job['id'] == job_id and job['worker'] == 'w2' and job['attempts'] == 2
+
+    # the first worker lost the job, it can't extend or finish it any more
+    assert queue.heartbeat(job_id, 'w1') == False
+    assert queue.done(job_id, 'w1') == False
+    assert queue.done(job_id, 'w2') == True
+    assert queue.stats()['done'] == 1
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.put({'name': 'a'})
+    queue.claim('w1', lease=0.2)
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.heartbeat(job_id, 'w1', lease=0.2) == True
+    assert queue.claim('w2') is None
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.put({'name': 'a'}, max_attempts=1)
+    queue.claim('w1', lease=0.05)
+    time.sleep(0.1)
+
+    assert queue.claim('w2') is None
+    assert queue.stats()['failed'] == 1
+    assert queue.pending() == 0
+
+
+def test_failed_jobs_back_off_then_give_up(tmp_path):
+    queue = make_queue(tmp_path, backoff=0.05)
+    job_id = queue.put({'name': 'a'}, max_attempts=2)
+
+    queue.claim('w1')
+    assert queue.fail(job_id, 'w1', 'boom') == True
+    assert queue.claim('w1') is None  # still backing off
+    time.sleep(0.1)
+    job = queue.claim('w1')
+    assert job['attempts'] == 2 and job['error'] == 'boom'
+
+    queue.fail(job_id, 'w1', 'boom again')
+    assert queue.stats()['failed'] == 1
+    assert queue.retry_failed() == 1
+    assert queue.claim('w1')['attempts'] == 1
+
+
+def test_journal_mode(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.db.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    queue.close()
+    queue = JobQueue(str(tmp_path / 'wal.db'), wal=True)
+    assert queue.db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
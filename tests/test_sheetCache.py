@@ -0,0 +1,115 @@
+import os
+import csv
+
+import pandas as pd
+
+from utils.sheetCache import SheetCache, LocalSheet, OVERLAP
+
+HEADER = ['Date', 'Read', 'Run']
+_mtime = [1_700_000_000]
+
+
+def write_sheet(path, rows, header=HEADER):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([header] + rows)
+    # a new mtime on every write, even within one clock tick
+    _mtime[0] += 1
+    os.utime(path, (_mtime[0], _mtime[0]))
+
+
+class CountingSheet(LocalSheet):
+    """ LocalSheet that remembers the ranges it was asked for """
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.ranges = []
+
+    def get_values(self, range_name):
+        self.ranges.append(range_name)
+        return super().get_values(range_name)
+
+
+def rows(n, start=0):
+    dates = pd.date_range('2026-01-01', periods=start + n, freq='D')[start:]
+    return [[d.strftime('%Y-%m-%d'), 1, -1] for d in dates]
+
+
+def synced(tmp_path, sheet_rows):
+    path = tmp_path / 'sheet.csv'
+    write_sheet(path, sheet_rows)
+    sheet = CountingSheet(str(path))
+    cache = SheetCache(str(tmp_path / 'cache'), 'test')
+    cache.sync(sheet)
+    sheet.ranges.clear()
+    return path, sheet, cache
+
+
+def test_incremental_sync_only_fetches_the_overlap_and_new_rows(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(30))
+
+    # the current day is edited and two days are added
+    updated = rows(32)
+    updated[29][1] = 0
+    write_sheet(path, updated)
+    data = SheetCache(str(tmp_path / 'cache'), 'test').sync(sheet)
+
+    assert sheet.ranges == [f'A{30 - OVERLAP + 2}:C']
+    assert data['Date'].tolist() == [r[0] for r in updated]
+    assert data['Read'].tolist() == [r[1] for r in updated]
+
+
+def test_edits_to_earlier_rows_in_the_overlap_are_picked_up(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(30))
+
+    updated = rows(30)
+    updated[25][1] = 0
+    updated[26][2] = 0
+    write_sheet(path, updated)
+    data = cache.sync(sheet)
+
+    assert len(sheet.ranges) == 1
+    assert data['Read'].tolist() == [r[1] for r in updated]
+    assert data['Run'].tolist() == [r[2] for r in updated]
+
+
+def test_edits_above_the_overlap_force_a_full_sync(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(30))
+
+    updated = rows(30)
+    updated[3][1] = 0
+    write_sheet(path, updated)
+    data = cache.sync(sheet)
+
+    assert sheet.ranges == [f'A{30 - OVERLAP + 2}:C', 'A2:C']
+    assert data['Read'].tolist() == [r[1] for r in updated]
+
+
+def test_moved_rows_fall_back_to_a_full_sync(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(30))
+
+    # a row above the overlap was deleted
+    updated = rows(3) + rows(28, start=4)
+    write_sheet(path, updated)
+    data = cache.sync(sheet)
+
+    assert sheet.ranges == [f'A{30 - OVERLAP + 2}:C', 'A2:C']
+    assert data['Date'].tolist() == [r[0] for r in updated]
+
+
+def test_short_sheets_overlap_every_row(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(3))
+    write_sheet(path, rows(5))
+    data = cache.sync(sheet)
+
+    assert sheet.ranges == ['A2:C']
+    assert len(data) == 5
+
+
+def test_header_change_forces_a_full_sync(tmp_path):
+    path, sheet, cache = synced(tmp_path, rows(20))
+
+    write_sheet(path, [r + [1] for r in rows(20)], header=HEADER + ['Walk'])
+    data = cache.sync(sheet)
+
+    assert sheet.ranges == ['A2:D']
+    assert data.columns.tolist() == HEADER + ['Walk']
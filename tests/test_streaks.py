@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from utils.streaks import StreakIndex
+
+HABITS = ['Read', 'Run', 'Walk']
+
+
+def random_matrix(days, seed):
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([-1, 0, 1], dtype=np.int8), size=(days, len(HABITS)), p=[0.2, 0.2, 0.6])
+
+
+def assert_same(a, b):
+    for value in (-1, 0, 1):
+        assert a.current(value).tolist() == b.current(value).tolist()
+        assert a.longest(value).tolist() == b.longest(value).tolist()
+        pd.testing.assert_frame_equal(a.history(value), b.history(value))
+
+
+def test_append_matches_a_full_build():
+    matrix = random_matrix(400, seed=3)
+    dates = pd.date_range('2025-01-01', periods=len(matrix), freq='D')
+    full = StreakIndex(HABITS, dates, matrix)
+
+    index = StreakIndex(HABITS, dates[:100], matrix[:100])
+    for start, end in ((100, 101), (101, 250), (250, 250), (250, 400)):
+        index.append(dates[start:end], matrix[start:end])
+
+    assert index.days == full.days
+    assert_same(index, full)
+
+
+def test_append_continues_the_current_streak():
+    dates = pd.date_range('2026-01-01', periods=6, freq='D')
+    matrix = np.array([[1, -1, 0]] * 6, dtype=np.int8)
+    index = StreakIndex(HABITS, dates[:4], matrix[:4])
+    index.append(dates[4:], matrix[4:])
+
+    assert index.current(1).tolist() == [6, 0, 0]
+    assert index.current(-1).tolist() == [0, 6, 0]
+    assert len(index.history(1)) == 1
+
+
+def test_append_to_an_empty_index():
+    matrix = random_matrix(30, seed=5)
+    dates = pd.date_range('2026-01-01', periods=30, freq='D')
+    index = StreakIndex(HABITS, dates[:0], matrix[:0])
+    index.append(dates, matrix)
+    assert_same(index, StreakIndex(HABITS, dates, matrix))
@@ -1,25 +1,25 @@
 import os
-import json5 as json
+
+from utils.dataMan import load_json, save_json
 
 
 class Config:
     def __init__(self, file_path):
 
+        self.DIR = os.path.dirname(os.path.realpath(__file__))
         if file_path is None:
             file_path = os.path.join(self.DIR, 'config.json')
-            
-        self.DIR = os.path.dirname(os.path.realpath(__file__))
+
         self.file = file_path
         self.data = self.get_data(self.file)
 
     def get_data(self,file):
         try:
-            with open(file,'r',encoding='utf-8') as f:
-                return json.load(f)
+            return load_json(file)
         except:
             return {}
 
     def set_data(self,data,file):
         # self.sort()
-        with open(file,'w',encoding='utf-8') as f:
-            json.dump(data,f,indent=4)
\ No newline at end of file
+        save_json(file, data)
+
@@ -0,0 +1,201 @@
+
+"""
+local analytics store
+
+sqlite copy of the habit data in narrow (date, habit, value) form.
+the primary key is (habit, date) and (date, habit, value) is a covering
+index, so window / per-habit questions only read the rows they need.
+
+    store = AnalyticsStore('analytics.db')
+    store.sync(ht.data)
+    store.summary(start='2026-01-01', end='2026-01-31')
+    store.monthly_rate('💊')
+
+    python -m utils.analyticsStore analytics.db --habit 💊
+
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from logging import Logger
+
+from utils.lazy import lazy_import
+from utils.summary import summary_frame
+from utils.runState import fingerprint
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS habit_values (
+    date  TEXT    NOT NULL,   -- YYYY-MM-DD
+    habit TEXT    NOT NULL,
+    value INTEGER NOT NULL,   -- -1 / 0 / 1
+    PRIMARY KEY (habit, date)
+) WITHOUT ROWID;
+-- covers date range counts without touching the table
+DROP INDEX IF EXISTS habit_values_date;
+CREATE INDEX IF NOT EXISTS habit_values_date_habit ON habit_values (date, habit, value);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _day(value) -> str:
+    return pd.Timestamp(value).strftime('%Y-%m-%d') if value is not None else None
+
+
+class AnalyticsStore:
+    """ date-indexed sqlite store of habit values """
+
+    def __init__(self, file_path: str, logger: Logger = None):
+        self.file_path = file_path
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+
+        self.db = sqlite3.connect(file_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def last_date(self) -> str:
+        return self.db.execute('SELECT MAX(date) FROM habit_values').fetchone()[0]
+
+    def habits(self) -> list:
+        return [row[0] for row in self.db.execute('SELECT DISTINCT habit FROM habit_values')]
+
+    def _meta(self, key: str) -> str:
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, data: pd.DataFrame, full: bool = False) -> int:
+        """
+        upsert a normalized habit frame (Date index, int8 habit columns, see utils.habitData).
+        only days from the last stored day on are written, unless full or the days
+        before it changed (an edited old day, a habit added / removed)
+        """
+        since = None if full else self.last_date()
+        if since is not None:
+            older = data[data.index < pd.Timestamp(since)]
+            if fingerprint(older) != self._meta('history'):
+                self.logger.info(f'analytics store: days before {since} changed, doing a full sync')
+                since, full = None, True
+        last = data.index.max() if len(data) else None
+        history = fingerprint(data[data.index < last]) if last is not None else None
+        if since is not None:
+            data = data[data.index >= pd.Timestamp(since)]
+        if len(data) == 0:
+            return 0
+
+        days = data.index.strftime('%Y-%m-%d').to_numpy()
+        habits = np.asarray(data.columns, dtype=object)
+        matrix = data.to_numpy()
+        rows = zip(
+            np.repeat(days, len(habits)).tolist(),
+            np.tile(habits, len(days)).tolist(),
+            matrix.ravel().tolist(),
+            )
+        with self.db:
+            if full:
+                self.db.execute('DELETE FROM habit_values')
+            self.db.executemany('INSERT OR REPLACE INTO habit_values (date, habit, value) VALUES (?, ?, ?)', rows)
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('history', ?)", (history,))
+        written = matrix.size
+        self.logger.info(f'analytics store: synced {written} values from {since or "the start"}')
+        return written
+
+    def _where(self, start=None, end=None, habit: str = None):
+        clauses, params = [], []
+        if habit is not None:
+            clauses.append('habit = ?')
+            params.append(habit)
+        if start is not None:
+            clauses.append('date >= ?')
+            params.append(_day(start))
+        if end is not None:
+            clauses.append('date <= ?')
+            params.append(_day(end))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """ ad-hoc sql """
+        cursor = self.db.execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=[c[0] for c in cursor.description])
+
+    def values(self, habit: str, start=None, end=None) -> pd.Series:
+        """ one habit's values by day """
+        where, params = self._where(start, end, habit)
+        df = self.query(f'SELECT date, value FROM habit_values{where} ORDER BY date', params)
+        return pd.Series(df['value'].to_numpy(), index=pd.DatetimeIndex(df['date'], name='Date'), name=habit)
+
+    def counts(self, start=None, end=None, habits: list = None) -> tuple:
+        """ (habits, (habits, 3) array of -1/0/1 counts, number of days) for a date range """
+        where, params = self._where(start, end)
+        rows = self.db.execute(
+            f'SELECT habit, value, COUNT(*) FROM habit_values{where} GROUP BY habit, value', params
+            ).fetchall()
+        days = self.db.execute(f'SELECT COUNT(DISTINCT date) FROM habit_values{where}', params).fetchone()[0]
+
+        if habits is None:
+            habits = sorted({habit for habit, _, _ in rows})
+        position = {habit: i for i, habit in enumerate(habits)}
+        counts = np.zeros((len(habits), 3), dtype=np.int64)
+        for habit, value, n in rows:
+            if habit in position and value in (-1, 0, 1):
+                counts[position[habit], value + 1] = n
+        return habits, counts, days
+
+    def summary(self, start=None, end=None, habits: list = None) -> pd.DataFrame:
+        """ same table as the report's summaries, for any date range """
+        habits, counts, days = self.counts(start, end, habits)
+        return summary_frame(habits, counts, days)
+
+    def rate(self, habit: str, start=None, end=None) -> float:
+        """ share of days the habit was done """
+        where, params = self._where(start, end, habit)
+        done, days = self.db.execute(
+            f'SELECT SUM(value = 1), COUNT(*) FROM habit_values{where}', params
+            ).fetchone()
+        return (done or 0) / days if days else 0.0
+
+    def monthly_rate(self, habit: str, start=None, end=None) -> pd.DataFrame:
+        """ Month | Rate | ✅ | Days for one habit """
+        where, params = self._where(start, end, habit)
+        return self.query(
+            f'''SELECT substr(date, 1, 7) AS Month,
+                       ROUND(AVG(value = 1), 4) AS Rate,
+                       SUM(value = 1) AS "✅",
+                       COUNT(*) AS Days
+                FROM habit_values{where}
+                GROUP BY Month ORDER BY Month''',
+            params,
+            )
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='query the local analytics store')
+    parser.add_argument('db')
+    parser.add_argument('--habit', help='monthly rate for one habit')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--sql', help='ad-hoc sql')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db) == False:
+        raise SystemExit(f'no store at {args.db}')
+
+    store = AnalyticsStore(args.db)
+    if args.sql:
+        print(store.query(args.sql).to_string(index=False))
+    elif args.habit:
+        print(store.monthly_rate(args.habit, args.start, args.end).to_string(index=False))
+    else:
+        print(store.summary(args.start, args.end).to_string(index=False))
@@ -0,0 +1,168 @@
+
+"""
+static charts
+
+per-habit calendar heatmap and 7-day trend as png, for gmail (no js).
+charts are rendered in a process pool and cached on disk under a hash of
+the habit's data slice, so habits that didn't change aren't re-rendered.
+the slice is the last `days` days, which moves every day, so the cache
+only saves work for repeat runs on the same day (resends, several
+trackers / the server over the same data). pngs that no run used for
+CACHE_DAYS days are deleted.
+
+"""
+
+from __future__ import annotations
+
+import os
+import io
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from logging import Logger
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# bump when the drawing code changes so cached pngs are re-rendered
+CHART_VERSION = 1
+KINDS = ('heatmap', 'trend')
+COLOURS = ['#ff4d4d', '#eeeeee', '#4dff88']  # -1, 0, 1
+CACHE_DAYS = 2
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    _pyplot().close(fig)
+    return buf.getvalue()
+
+
+def heatmap_png(dates: np.ndarray, values: np.ndarray) -> bytes:
+    """ github style calendar: a column per week, a row per weekday """
+    from matplotlib.colors import ListedColormap
+    plt = _pyplot()
+
+    offset = pd.Timestamp(dates[0]).weekday()
+    day = (dates - dates[0]).astype('timedelta64[D]').astype(int) + offset
+    weeks = int(day.max()) // 7 + 1
+    grid = np.full((7, weeks), np.nan)
+    grid[day % 7, day // 7] = values
+
+    fig, ax = plt.subplots(figsize=(max(weeks * 0.16, 2.0), 1.4), dpi=100)
+    ax.imshow(grid, cmap=ListedColormap(COLOURS), vmin=-1, vmax=1, aspect='equal')
+    ax.set_yticks([0, 2, 4, 6])
+    ax.set_yticklabels(['Mon', 'Wed', 'Fri', 'Sun'], fontsize=6)
+    ax.set_xticks([])
+    for side in ax.spines.values():
+        side.set_visible(False)
+    return _png(fig)
+
+
+def trend_png(dates: np.ndarray, values: np.ndarray) -> bytes:
+    """ 7-day rolling completion rate """
+    plt = _pyplot()
+
+    done = pd.Series((values == 1).astype(float), index=pd.DatetimeIndex(dates))
+    rate = done.rolling(7, min_periods=1).mean()
+
+    fig, ax = plt.subplots(figsize=(4.0, 1.4), dpi=100)
+    ax.fill_between(rate.index, rate.to_numpy(), color=COLOURS[2], alpha=0.6, linewidth=0)
+    ax.plot(rate.index, rate.to_numpy(), color='#2e9958', linewidth=1)
+    ax.set_ylim(0, 1)
+    ax.set_yticks([0, 0.5, 1])
+    ax.tick_params(labelsize=6)
+    fig.autofmt_xdate()
+    return _png(fig)
+
+
+RENDERERS = {'heatmap': heatmap_png, 'trend': trend_png}
+
+
+def _render(job: tuple) -> str:
+    """ process pool job: render one chart and write it to its cache path """
+    kind, dates, values, path = job
+    png = RENDERERS[kind](dates, values)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(png)
+    os.replace(tmp, path)
+    return path
+
+
+def chart_key(kind: str, habit: str, dates: np.ndarray, values: np.ndarray) -> str:
+    """ content hash of one chart's inputs """
+    h = hashlib.sha256(f'{CHART_VERSION}|{kind}|{habit}|'.encode())
+    h.update(dates.astype('datetime64[D]').tobytes())
+    h.update(values.tobytes())
+    return h.hexdigest()
+
+
+def prune_cache(cache_dir: str, keep_days: float = CACHE_DAYS) -> int:
+    """ delete cached pngs not used (mtime) in the last keep_days days, returns how many """
+    cutoff = time.time() - keep_days * 86400
+    removed = 0
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.png') and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def render_charts(data: pd.DataFrame,
+                  cache_dir: str,
+                  days: int = 365,
+                  workers: int = None,
+                  logger: Logger = None,
+                  ) -> dict:
+    """
+    heatmap + trend png for every habit over the last `days` days of a
+    normalized habit frame (see utils.habitData)
+    returns {habit: {kind: (cid, path)}}
+    """
+    if logger == None:
+        logger = Logger('log')
+    if os.path.exists(cache_dir) == False:
+        os.makedirs(cache_dir)
+
+    recent = data.sort_index().iloc[-days:]
+    dates = recent.index.values
+    if len(dates) == 0:
+        return {}
+
+    charts, jobs = {}, []
+    for habit in recent.columns:
+        values = recent[habit].to_numpy()
+        charts[habit] = {}
+        for kind in KINDS:
+            key = chart_key(kind, habit, dates, values)
+            path = os.path.join(cache_dir, f'{key}.png')
+            charts[habit][kind] = (key[:24], path)
+            if os.path.exists(path) == False:
+                jobs.append((kind, dates, values, path))
+            else:
+                # mark as used so prune_cache keeps it
+                os.utime(path)
+
+    if len(jobs) > 0:
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                _render(job)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_render, jobs))
+    removed = prune_cache(cache_dir)
+    logger.info(f'charts: {len(jobs)} rendered, {len(KINDS) * len(charts) - len(jobs)} from cache, {removed} stale pruned')
+    return charts
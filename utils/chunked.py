@@ -0,0 +1,167 @@
+
+"""
+chunked aggregation
+
+folds raw submission blocks (see DataSource.blocks) into running totals,
+so a long history never has to be in memory at once:
+    counts  - -1/0/1 counts per habit over every day
+    streaks - current / longest streaks (StreakState)
+    tail    - the last tail_days days as a normal habit frame, for the
+              week / window summaries, charts and the inline table
+
+blocks are expected oldest first, like a sheet or log that is appended to.
+same-day submissions are merged and calendar gaps filled across block
+edges; a row older than the day being folded can't be merged any more
+and is counted in `late`.
+
+    totals = ChunkedAggregate(tail_days=90)
+    for block in source.blocks(5000):
+        totals.add(block)
+    totals.finish()
+
+"""
+
+from __future__ import annotations
+
+import os
+import gzip
+from logging import Logger
+
+from utils.lazy import lazy_import
+from utils.habitData import normalize, get_habits
+from utils.summary import value_counts, VALUES
+from utils.streaks import StreakState
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+class ChunkedAggregate:
+    """ running habit totals over blocks of raw rows """
+
+    def __init__(self,
+                 tail_days: int = 90,
+                 today=None,
+                 export_path: str = None,
+                 logger: Logger = None,
+                 ):
+        """
+        tail_days: days kept as a frame (newest first in .tail after finish())
+        export_path: also stream every folded day into this csv.gz (oldest first)
+        """
+        self.tail_days = tail_days
+        self.today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+
+        self.habits = []
+        self.counts = np.zeros((0, len(VALUES)), dtype=np.int64)
+        self.days = 0
+        self.streaks = StreakState([])
+        self.first_date = None
+        self.last_date = None
+        self.late = 0
+
+        self.blocks = []        # folded frames (oldest first) covering at least the tail
+        self.block_days = 0
+        self.carry = None       # last day seen, it may still get more submissions
+
+        self.export_path = export_path
+        self.export = None
+        self.export_columns = None
+        if export_path:
+            self.export = gzip.open(export_path + '.tmp', 'wt', encoding='utf-8', newline='')
+
+    def _add_habits(self, habits: list):
+        """ habit columns that show up later, every day before counts as 0 """
+        self.habits += habits
+        added = np.zeros((len(habits), len(VALUES)), dtype=np.int64)
+        added[:, VALUES.index(0)] = self.days
+        self.counts = np.vstack([self.counts, added])
+        self.streaks.add_habits(habits)
+        self.blocks = [b.assign(**{h: np.int8(0) for h in habits}) for b in self.blocks]
+        if self.carry is not None:
+            self.carry = self.carry.assign(**{h: np.int8(0) for h in habits})
+
+    def _fold(self, frame: pd.DataFrame):
+        """ add finished days (oldest first, one row per day, no gaps) to the totals """
+        if len(frame) == 0:
+            return
+        matrix = frame.to_numpy()
+        self.counts += value_counts(matrix)
+        self.streaks.append(matrix)
+        self.days += len(frame)
+        if self.first_date is None:
+            self.first_date = frame.index[0]
+        self.last_date = frame.index[-1]
+
+        self.blocks.append(frame)
+        self.block_days += len(frame)
+        # drop whole blocks that are entirely outside the tail
+        while self.block_days - len(self.blocks[0]) >= self.tail_days:
+            self.block_days -= len(self.blocks.pop(0))
+
+        if self.export is not None:
+            if self.export_columns is None:
+                self.export_columns = list(frame.columns)
+                frame.to_csv(self.export, date_format='%Y-%m-%d')
+            else:
+                frame.reindex(columns=self.export_columns).to_csv(self.export, header=False, date_format='%Y-%m-%d')
+
+    def add(self, block: pd.DataFrame):
+        """ fold one block of raw rows (same columns as the sheet) """
+        new = [h for h in get_habits(block) if h not in self.habits]
+        if new:
+            self._add_habits(new)
+        missing = [h for h in self.habits if h not in block.columns]
+        if missing:
+            block = block.assign(**{h: np.nan for h in missing})
+
+        data = normalize(block, habits=self.habits, fill_gaps=False).iloc[::-1]
+        data = data[data.index <= self.today]
+        if self.carry is not None:
+            late = data.index < self.carry.index[0]
+            self.late += int(late.sum())
+            data = pd.concat([self.carry, data[~late]])
+            if not data.index.is_unique:
+                data = data.groupby(level=0).max()
+        if len(data) == 0:
+            return
+
+        calendar = pd.date_range(data.index[0], data.index[-1], freq='D', name='Date')
+        if len(calendar) != len(data):
+            data = data.reindex(calendar, fill_value=0)
+
+        self._fold(data.iloc[:-1])
+        self.carry = data.iloc[-1:]
+
+    def finish(self):
+        """ fold the last day and close the export """
+        if self.carry is not None:
+            self._fold(self.carry)
+            self.carry = None
+        if self.last_date is not None and self.last_date < self.today:
+            # nothing logged yet up to today: 0 in the counts (like WindowCounter), not in the streaks / tail
+            gap = (self.today - self.last_date).days
+            self.counts[:, VALUES.index(0)] += gap
+            self.days += gap
+        if self.export is not None:
+            self.export.close()
+            self.export = None
+            os.replace(self.export_path + '.tmp', self.export_path)
+        if self.late > 0:
+            self.logger.warning(f'chunked: {self.late} rows older than already folded days were left out')
+        return self
+
+    @property
+    def tail(self) -> pd.DataFrame:
+        """ last tail_days days, newest first (like HabitTracker.data) """
+        if len(self.blocks) == 0:
+            return pd.DataFrame(
+                np.zeros((0, len(self.habits)), dtype=np.int8),
+                columns=self.habits,
+                index=pd.DatetimeIndex([], name='Date'),
+                )
+        tail = pd.concat(self.blocks).iloc[-self.tail_days:]
+        return tail.iloc[::-1]
@@ -0,0 +1,90 @@
+
+"""
+cron expressions
+
+5 fields: minute hour day-of-month month day-of-week (0 or 7 = sunday)
+each field takes *, a, a-b, a,b,c and /step (*/15, 1-5/2).
+like cron, when both day fields are restricted a day matching either one runs.
+
+    CronExpression('30 7 * * 1-5').next_after(now)   # 07:30 on weekdays
+
+"""
+
+import datetime
+
+FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+]
+
+
+def _parse_field(text: str, low: int, high: int) -> set:
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f'bad cron field {text!r} (allowed {low}-{high})')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """ parsed 5 field cron expression """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f'cron expression needs 5 fields: {expression!r}')
+
+        fields = {name: _parse_field(p, low, high) for p, (name, low, high) in zip(parts, FIELDS)}
+        self.minutes = fields['minute']
+        self.hours = fields['hour']
+        self.days = fields['day']
+        self.months = fields['month']
+        # cron sunday is 0 or 7, python's is 6
+        self.weekdays = {(d - 1) % 7 for d in fields['weekday']}
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    def _day_matches(self, dt: datetime.datetime) -> bool:
+        day = dt.day in self.days
+        weekday = dt.weekday() in self.weekdays
+        if self.any_day:
+            return weekday
+        if self.any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, dt: datetime.datetime) -> datetime.datetime:
+        """ first matching minute strictly after dt (keeps dt's tzinfo) """
+        dt = dt.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = dt + datetime.timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + datetime.timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += datetime.timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f'cron expression never matches: {self.expression!r}')
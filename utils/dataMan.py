@@ -1,8 +1,76 @@
 
 import os
-import json5 as json
+import copy
+import re
+import json
+import threading
 from logging import Logger
 
+from utils.lazy import lazy_import
+
+json5 = lazy_import('json5')
+
+# path -> ((mtime_ns, size), parsed data)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _stamp(file_path: str) -> tuple:
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+# strings are matched first so // or , inside them are left alone
+_COMMENTS = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.S)
+_TRAILING_COMMAS = re.compile(r'("(?:\\.|[^"\\])*")|,(\s*[}\]])')
+
+
+def parse_json(text: str):
+    """
+    stdlib json first, with // and /* */ comments and trailing commas stripped
+    (the config templates use them), json5 only for anything else it allows
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    stripped = _COMMENTS.sub(lambda m: m.group(1) or '', text)
+    stripped = _TRAILING_COMMAS.sub(lambda m: m.group(1) or m.group(2), stripped)
+    try:
+        return json.loads(stripped)
+    except ValueError:
+        return json5.loads(text)
+
+
+def load_json(file_path: str):
+    """
+    parsed contents of a json/json5 file, cached on (path, mtime, size).
+    returns a copy, so callers can change it without touching the cache
+    """
+    file_path = os.path.abspath(file_path)
+    stamp = _stamp(file_path)
+    with _cache_lock:
+        cached = _cache.get(file_path)
+    if cached is None or cached[0] != stamp:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = parse_json(f.read())
+        cached = (stamp, data)
+        with _cache_lock:
+            _cache[file_path] = cached
+    return copy.deepcopy(cached[1])
+
+
+def save_json(file_path: str, data, indent: int = 4):
+    """ write through a temp file + rename, so readers never see half a file """
+    file_path = os.path.abspath(file_path)
+    tmp = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp, file_path)
+    with _cache_lock:
+        _cache[file_path] = (_stamp(file_path), copy.deepcopy(data))
+
+
 class DataManager():
     def __init__(self,
                 file_dir: str = None,
@@ -14,7 +82,7 @@ class DataManager():
         self.throwError = throwError
 
         self.file_dir = file_dir
-        
+
         self.logger = logger
         if self.logger == None:
             self.logger =  Logger('log')
@@ -26,8 +94,8 @@ class DataManager():
     def load(self):
         self.logger.info('loading Json data')
         try:
-            with open(self.file_dir,'r') as file:
-                return json.load(file)
+            self.stamp = _stamp(self.file_dir)
+            return load_json(self.file_dir)
         except:
             self.logger.error('error, while loading json file - creating a new json file')
             if self.throwError:
@@ -37,9 +105,30 @@ class DataManager():
             return self.data
 
     def save(self):
-        with open(self.file_dir,'w') as file:
-            file.write(json.dumps(self.data,indent=4))
-            self.logger.info(f'saved file {self.file_dir}')
+        save_json(self.file_dir, self.data)
+        self.stamp = _stamp(self.file_dir)
+        self.logger.info(f'saved file {self.file_dir}')
+
+    def changed(self) -> bool:
+        """ has the file changed on disk since it was loaded/saved """
+        try:
+            return _stamp(self.file_dir) != self.stamp
+        except OSError:
+            return False
+
+    def reload(self) -> bool:
+        """ re-read the file if it changed, True if it did """
+        if self.changed() == False:
+            return False
+        try:
+            self.stamp = _stamp(self.file_dir)
+            self.data = load_json(self.file_dir)
+        except (OSError, ValueError) as e:
+            # keep the last good data while the file is half edited
+            self.logger.error(f'error, while reloading {self.file_dir}: {e}')
+            return False
+        self.logger.info(f'reloaded {self.file_dir}')
+        return True
 
     def print(self):
-        print(json.dumps(self.data,indent=4))
\ No newline at end of file
+        print(json.dumps(self.data,indent=4))
@@ -0,0 +1,230 @@
+
+"""
+data sources
+
+where HabitTracker gets its raw submissions from. a source has two methods:
+    read()          -> raw frame, one row per submission (Date + habit columns)
+    modified_time() -> cheap change marker (no data read), None if unknown
+
+    SheetSource  - a google sheet (or its csv stand-in) through SheetCache
+    StreamSource - a local .jsonl / .csv file that only ever grows; it
+                   remembers the byte offset it parsed up to, so each read
+                   only parses the lines appended since the last one
+
+blocks() gives the same data a block of rows at a time for chunked runs
+(see utils.chunked).
+
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import csv
+import json
+import hashlib
+from abc import ABC, abstractmethod
+from logging import Logger
+
+from utils.lazy import lazy_import
+from utils.sheetCache import SheetCache, modified_time, records_to_frame, _col_letter
+
+pd = lazy_import('pandas')
+
+CHUNK_SIZE = 1 << 20
+
+
+class DataSource(ABC):
+    """ interface for raw submission sources """
+
+    @abstractmethod
+    def read(self) -> pd.DataFrame:
+        """ every submission so far as a raw frame """
+
+    def modified_time(self) -> str:
+        return None
+
+    def blocks(self, block_rows: int = 5000):
+        """ the raw data as frames of about block_rows rows (oldest first), for chunked runs """
+        yield self.read()
+
+
+class SheetSource(DataSource):
+    """ google sheet worksheet (or LocalSheet), synced incrementally through SheetCache """
+
+    def __init__(self, sheet, root: str, gsheet_id: str, logger: Logger = None):
+        self.sheet = sheet
+        self.cache = SheetCache(root, gsheet_id, logger=logger)
+
+    def read(self) -> pd.DataFrame:
+        return self.cache.sync(self.sheet)
+
+    def modified_time(self) -> str:
+        return modified_time(self.sheet)
+
+    def blocks(self, block_rows: int = 5000):
+        """
+        the sheet a row range at a time, straight from the sheet: the SheetCache
+        keeps the whole history in one frame, so a chunked run skips it and
+        fetches every row on every run
+        """
+        header = self.sheet.row_values(1)
+        end_col = _col_letter(len(header))
+        start = 2
+        while True:
+            values = self.sheet.get_values(f'A{start}:{end_col}{start + block_rows - 1}')
+            if len(values) > 0:
+                yield records_to_frame(header, values)
+            if len(values) < block_rows:
+                return
+            start += block_rows
+
+
+def read_lines(f, chunk_size: int = CHUNK_SIZE):
+    """
+    complete lines from a binary file's current position as (line, offset after it).
+    a last line without its newline is still being written and is left for next time
+    """
+    offset = f.tell()
+    rest = b''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            offset += len(line) + 1
+            yield line.rstrip(b'\r'), offset
+
+
+class StreamSource(DataSource):
+    """
+    append-only .jsonl (one json object per submission) or .csv (header row
+    first, no newlines inside fields) file, parsed incrementally.
+    the parsed rows and the offset are kept under root; a file that shrank
+    or whose first line changed (rotated / rewritten) is parsed again from the start
+    """
+
+    def __init__(self, file_path: str, root: str, logger: Logger = None):
+        self.file_path = file_path
+        self.kind = 'jsonl' if file_path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+
+        if os.path.exists(root) == False:
+            os.makedirs(root)
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:12]
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        self.data_file = os.path.join(root, f'stream-{name}-{key}.pkl')
+        self.meta_file = os.path.join(root, f'stream-{name}-{key}.json')
+
+        self.data = None
+        self.meta = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            self.data = pd.read_pickle(self.data_file)
+        except Exception:
+            self.meta = {}
+            self.data = None
+
+    def save(self):
+        tmp = f'{self.data_file}.{os.getpid()}.tmp'
+        self.data.to_pickle(tmp)
+        os.replace(tmp, self.data_file)
+        tmp = f'{self.meta_file}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=4)
+        os.replace(tmp, self.meta_file)
+
+    def modified_time(self) -> str:
+        st = os.stat(self.file_path)
+        return f'{st.st_mtime_ns}:{st.st_size}'
+
+    def _first_line(self, f) -> str:
+        f.seek(0)
+        return hashlib.sha1(f.readline()).hexdigest()
+
+    def _parse_csv(self, lines: list, header: list) -> tuple:
+        if header is None:
+            if len(lines) == 0:
+                return pd.DataFrame(), None
+            header = next(csv.reader([lines[0].decode('utf-8-sig')]))
+            lines = lines[1:]
+        if len(lines) == 0:
+            return pd.DataFrame(columns=header), header
+        # pandas' c parser, numbers come out typed like _numericise would give them
+        data = pd.read_csv(
+            io.BytesIO(b'\n'.join(lines)),
+            header=None,
+            names=header,
+            index_col=False,
+            encoding='utf-8',
+            )
+        return data, header
+
+    def _parse_jsonl(self, lines: list) -> pd.DataFrame:
+        records = []
+        for line in lines:
+            if line.strip() == b'':
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                self.logger.error(f'{self.file_path}: skipping a bad json line ({line[:80]!r})')
+        return pd.DataFrame.from_records(records)
+
+    def _parse(self, lines: list, header: list) -> tuple:
+        if self.kind == 'csv':
+            return self._parse_csv(lines, header)
+        return self._parse_jsonl(lines), header
+
+    def blocks(self, block_rows: int = 5000):
+        """ the whole file block_rows lines at a time, nothing is kept """
+        header = None
+        with open(self.file_path, 'rb') as f:
+            lines = []
+            for line, _ in read_lines(f):
+                lines.append(line)
+                if len(lines) >= block_rows:
+                    block, header = self._parse(lines, header)
+                    lines = []
+                    yield block
+            if len(lines) > 0:
+                yield self._parse(lines, header)[0]
+
+    def read(self) -> pd.DataFrame:
+        """ everything parsed so far plus the lines appended since the last read """
+        with open(self.file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            first = self._first_line(f)
+            offset = self.meta.get('offset', 0)
+            if self.data is None or size < offset or first != self.meta.get('first_line'):
+                if offset > 0:
+                    self.logger.info(f'{self.file_path} was rewritten, parsing it again')
+                self.data, self.meta, offset = None, {}, 0
+
+            f.seek(offset)
+            lines = []
+            for line, end in read_lines(f):
+                lines.append(line)
+                offset = end
+
+        new, header = self._parse(lines, self.meta.get('header'))
+
+        if self.data is None:
+            self.data = new
+        elif len(new) > 0:
+            self.data = pd.concat([self.data, new], ignore_index=True)
+        self.logger.info(f'{self.file_path}: {len(new)} new rows, {len(self.data)} total')
+
+        if len(lines) > 0 or self.meta.get('offset') != offset:
+            self.meta = {'offset': offset, 'first_line': first, 'header': header, 'rows': len(self.data)}
+            self.save()
+        return self.data.copy()
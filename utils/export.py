@@ -0,0 +1,69 @@
+
+"""
+history export
+
+the full habit history as a gzipped csv, written a block of rows at a
+time, so the report can inline only recent days and attach the rest.
+files are named after the tracker and a hash of the data, an unchanged
+history is not written again and older copies of a tracker's history are
+removed, so there is one file per tracker.
+
+"""
+
+from __future__ import annotations
+
+import os
+import gzip
+
+from utils.lazy import lazy_import
+from utils.runState import fingerprint
+
+pd = lazy_import('pandas')
+
+CHUNK_ROWS = 5000
+
+
+def write_csv_gz(data: pd.DataFrame, file_path: str, chunk_rows: int = CHUNK_ROWS) -> str:
+    """ stream data into a gzipped csv chunk by chunk, written atomically """
+    tmp = file_path + '.tmp'
+    with gzip.open(tmp, 'wt', encoding='utf-8', newline='') as f:
+        for start in range(0, max(len(data), 1), chunk_rows):
+            data.iloc[start:start + chunk_rows].to_csv(f, header=start == 0, date_format='%Y-%m-%d')
+    os.replace(tmp, file_path)
+    return file_path
+
+
+def export_history(data: pd.DataFrame, cache_dir: str, name: str = 'habit_history') -> str:
+    """ path of <name>-<hash>.csv.gz for data, written if it isn't cached yet (older <name>-<hash> files are deleted) """
+    if os.path.exists(cache_dir) == False:
+        os.makedirs(cache_dir)
+
+    file_name = f'{name}-{fingerprint(data)[:16]}.csv.gz'
+    file_path = os.path.join(cache_dir, file_name)
+    if os.path.exists(file_path) == False:
+        write_csv_gz(data, file_path)
+
+    for entry in os.listdir(cache_dir):
+        digest = entry[len(name) + 1:-len('.csv.gz')]
+        if entry != file_name and entry.startswith(f'{name}-') and entry.endswith('.csv.gz') \
+                and len(digest) == 16 and all(c in '0123456789abcdef' for c in digest):
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except FileNotFoundError:
+                pass
+    return file_path
+
+
+def recent_rows(data: pd.DataFrame, window, today=None) -> pd.DataFrame:
+    """
+    rows of a date indexed frame inside a window: number of days, 'mtd' or 'all'.
+    the row order of data is kept
+    """
+    if window in (None, 'all'):
+        return data
+    today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+    if window == 'mtd':
+        start = today.replace(day=1)
+    else:
+        start = today - pd.Timedelta(days=int(window) - 1)
+    return data[data.index >= start]
@@ -0,0 +1,76 @@
+
+"""
+habit data normalization
+
+turns the sheet frame into a compact typed habit matrix:
+one parsed Date index (newest day first) and an int8 column per habit,
+checked to only hold -1 / 0 / 1.
+
+several submissions on the same day are merged with a column-wise max()
+(a habit done in any of them counts as done) and missing calendar days
+are filled in as all 0.
+
+"""
+
+from __future__ import annotations
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+HABIT_VALUES = (-1, 0, 1)
+
+# sheet columns that aren't habits
+META_COLUMNS = ['Date', 'Timestamp', 'Month', 'Week', 'Year', 'DeltaDay', '📶']
+
+
+def get_habits(df: pd.DataFrame) -> list:
+    """ habit columns of a sheet frame """
+    return [c for c in df.columns if c not in META_COLUMNS]
+
+
+def normalize(df: pd.DataFrame,
+              habits: list = None,
+              dedup: bool = True,
+              fill_gaps: bool = True,
+              ) -> pd.DataFrame:
+    """
+    habit frame indexed by day (newest first) with int8 habit columns.
+    blank cells become 0, anything else that isn't -1/0/1 raises a ValueError.
+    dedup: one row per day (column-wise max of that day's submissions)
+    fill_gaps: add missing days between the first and last day as all 0
+    """
+    if habits is None:
+        habits = get_habits(df)
+
+    # google form exports have a submission Timestamp instead of a Date
+    date_column = 'Date' if 'Date' in df.columns else 'Timestamp'
+    dates = pd.to_datetime(df[date_column], errors="coerce").dt.normalize()
+
+    values = df[habits]
+    if all(pd.api.types.is_numeric_dtype(t) for t in values.dtypes):
+        # already typed (csv parser, jsonl): no blanks to strip or strings to coerce
+        numbers = values.to_numpy(dtype=float)
+        bad = ~np.isnan(numbers) & ~np.isin(numbers, HABIT_VALUES)
+    else:
+        values = values.replace(r'^\s*$', np.nan, regex=True)
+        frame = values.apply(pd.to_numeric, errors='coerce')
+        bad = ((frame.isna() & values.notna()) | ~(frame.isin(HABIT_VALUES) | frame.isna())).to_numpy()
+        numbers = frame.to_numpy(dtype=float)
+    if bad.any():
+        columns = [h for h, b in zip(habits, bad.any(axis=0)) if b]
+        raise ValueError(f'habit values must be -1, 0 or 1, check columns: {columns}')
+
+    matrix = np.nan_to_num(numbers, nan=0).astype(np.int8)
+    data = pd.DataFrame(matrix, columns=habits, index=pd.DatetimeIndex(dates, name='Date'))
+    data = data[data.index.notna()]
+
+    if dedup and not data.index.is_unique:
+        data = data.groupby(level=0).max()
+    if fill_gaps and len(data) > 0 and data.index.is_unique:
+        calendar = pd.date_range(data.index.min(), data.index.max(), freq='D', name='Date')
+        if len(calendar) != len(data):
+            data = data.reindex(calendar, fill_value=0)
+
+    return data.sort_index(ascending=False, kind='stable')
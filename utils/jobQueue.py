@@ -0,0 +1,166 @@
+
+"""
+report job queue
+
+sqlite backed queue of tracker jobs, no broker needed. producers put()
+tracker configs, any number of workers claim() them with a lease:
+
+    queue = JobQueue('jobs.db')
+    queue.put({'name': 'justin', 'gsheet_id': ...})
+
+    job = queue.claim('host-1:1234', lease=300)
+    ...                              # heartbeat() while it runs
+    queue.done(job['id'], worker)    # or queue.fail(job['id'], worker, error)
+
+a job whose lease runs out (crashed / killed worker) can be claimed again,
+so delivery is at least once. failed jobs are retried with exponential
+backoff until max_attempts. workers on other hosts need the db on a shared
+disk with working file locks; the default rollback journal works there.
+wal=True switches the db to sqlite's WAL journal (readers don't block the
+writer), which needs shared memory, so only use it when every worker runs
+on the same host. the journal mode sticks to the db file once set.
+
+"""
+
+import json
+import time
+import sqlite3
+from logging import Logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY,
+    name         TEXT,
+    payload      TEXT    NOT NULL,              -- tracker config as json
+    status       TEXT    NOT NULL DEFAULT 'queued', -- queued / running / done / failed
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after    REAL    NOT NULL,              -- unix time, for retry backoff
+    lease_until  REAL,
+    worker       TEXT,
+    error        TEXT,
+    created      REAL    NOT NULL,
+    updated      REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class JobQueue:
+    """ lease based job queue in one sqlite file """
+
+    def __init__(self, file_path: str = 'jobs.db', logger: Logger = None, backoff: float = 30.0, wal: bool = False):
+        self.file_path = file_path
+        self.backoff = backoff
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+
+        # autocommit, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(file_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        if wal:
+            self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _job(self, row) -> dict:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def put(self, payload: dict, max_attempts: int = 3, delay: float = 0) -> int:
+        """ enqueue one tracker config, returns the job id """
+        now = time.time()
+        cursor = self.db.execute(
+            'INSERT INTO jobs (name, payload, max_attempts, run_after, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+            (payload.get('name'), json.dumps(payload), max_attempts, now + delay, now, now),
+            )
+        return cursor.lastrowid
+
+    def claim(self, worker: str, lease: float = 300) -> dict:
+        """
+        lease the oldest ready job (queued and due, or running with an expired lease).
+        returns the job as a dict, None if nothing is ready
+        """
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            # expired leases that already used up their attempts are given up on
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', updated = ? "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                (now, now),
+                )
+            row = self.db.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY run_after, id LIMIT 1",
+                (now, now),
+                ).fetchone()
+            if row is None:
+                self.db.execute('COMMIT')
+                return None
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker, now + lease, now, row['id']),
+                )
+            job = self.db.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return self._job(job)
+
+    def _update(self, job_id: int, worker: str, sql: str, params: tuple) -> bool:
+        """ update a job only while worker still holds its lease """
+        cursor = self.db.execute(
+            f"UPDATE jobs SET {sql}, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (*params, time.time(), job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: int, worker: str, lease: float = 300) -> bool:
+        """ extend the lease, False if the job was lost to another worker """
+        return self._update(job_id, worker, 'lease_until = ?', (time.time() + lease,))
+
+    def done(self, job_id: int, worker: str) -> bool:
+        return self._update(job_id, worker, "status = 'done', lease_until = NULL, error = NULL", ())
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """ back to the queue with exponential backoff, or failed after max_attempts """
+        row = self.db.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return False
+        if row['attempts'] >= row['max_attempts']:
+            return self._update(job_id, worker, "status = 'failed', lease_until = NULL, error = ?", (error,))
+        run_after = time.time() + self.backoff * 2 ** (row['attempts'] - 1)
+        return self._update(
+            job_id, worker,
+            "status = 'queued', lease_until = NULL, error = ?, run_after = ?",
+            (error, run_after),
+            )
+
+    def retry_failed(self) -> int:
+        """ put every failed job back in the queue with fresh attempts """
+        now = time.time()
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, run_after = ?, updated = ? WHERE status = 'failed'",
+            (now, now),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """ {status: count} """
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, n in self.db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'):
+            counts[status] = n
+        return counts
+
+    def pending(self) -> int:
+        """ jobs that still have to run (queued or running) """
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
@@ -0,0 +1,70 @@
+
+"""
+lazy imports
+
+    pd = lazy_import('pandas')
+
+pd is a stand-in module, pandas is only imported the first time an
+attribute is used. every lazy module is shared by name, so the first user
+(whoever it is) pays the import and runs the on_load hooks.
+
+"""
+
+import time
+import types
+import importlib
+
+_modules = {}
+
+
+class LazyModule(types.ModuleType):
+    """ module that imports itself on first attribute access """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_hooks = []
+        self._lazy_module = None
+        self._lazy_seconds = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self.__name__)
+            self._lazy_seconds = time.perf_counter() - start
+            self._lazy_module = module
+            for hook in self._lazy_hooks:
+                hook(module)
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str, on_load=None) -> LazyModule:
+    """ lazy stand-in for `name`, on_load(module) runs once right after the real import """
+    module = _modules.get(name)
+    if module is None:
+        module = LazyModule(name)
+        _modules[name] = module
+    if on_load is not None:
+        if module._lazy_module is not None:
+            on_load(module._lazy_module)
+        else:
+            module._lazy_hooks.append(on_load)
+    return module
+
+
+def import_times() -> dict:
+    """
+    force every lazy module in and return {name: seconds its import took}.
+    modules that share dependencies (pandas -> numpy) are charged in the
+    order they load, so the first one carries the shared cost
+    """
+    times = {}
+    for name, module in _modules.items():
+        module._load()
+        times[name] = module._lazy_seconds
+    return times
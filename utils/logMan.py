@@ -1,6 +1,12 @@
 
 import os
+import io
+import json
+import time
 import datetime
+import functools
+import threading
+from contextlib import contextmanager
 
 import logging 
 from logging import Logger
@@ -64,6 +70,120 @@ def createLogger(
     return logger
 
 
+class MetricsSink:
+    """ appends one json object per line to a metrics file """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def _format_fields(fields: dict) -> str:
+    return ' '.join(f'{k}={v:.3f}' if isinstance(v, float) else f'{k}={v}' for k, v in fields.items())
+
+
+def _emit(logger: Logger, sink: MetricsSink, record: dict):
+    logger.info(_format_fields(record))
+    if sink is not None:
+        sink.write({'time': datetime.datetime.now().isoformat(timespec='milliseconds'), **record})
+
+
+@contextmanager
+def timed(logger: Logger, stage: str, sink: MetricsSink = None, **fields):
+    """
+    time a block, log it as `stage=... seconds=... <fields>` and write it to sink.
+    the yielded dict can be filled in with more fields (row counts, ...)
+
+        with timed(logger, 'fetch', sink, tracker=name) as m:
+            data = fetch()
+            m['rows'] = len(data)
+    """
+    record = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _emit(logger, sink, {'stage': stage, 'seconds': time.perf_counter() - start, **record})
+
+
+def stage(name: str, fields=None):
+    """
+    decorator for pipeline methods, the object needs .logger and .timings
+    (and optionally .metrics: MetricsSink, .metrics_tags: dict).
+
+    times are exclusive, a stage that pulls in another stage isn't charged for it.
+    fields(result) -> dict adds counts (rows, habits, ...) to the record
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            outer = getattr(self, '_stage_child', 0.0)
+            self._stage_child = 0.0
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(self, *args, **kwargs)
+                return result
+            finally:
+                total = time.perf_counter() - start
+                own = total - self._stage_child
+                self.timings[name] = self.timings.get(name, 0.0) + own
+                self._stage_child = outer + total
+
+                record = {'stage': name, 'step': func.__name__, 'seconds': own, **getattr(self, 'metrics_tags', {})}
+                if fields is not None and result is not None:
+                    record.update(fields(result))
+                _emit(self.logger, getattr(self, 'metrics', None), record)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile(logger: Logger, mode: str = 'cprofile', file_path: str = None, top: int = 20):
+    """
+    opt-in profiling of a block
+        cprofile    - logs the top functions by cumulative time (and dumps stats to file_path)
+        tracemalloc - logs peak memory and the top allocating lines
+    """
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if file_path:
+                profiler.dump_stats(file_path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+            logger.info('cProfile\n' + out.getvalue())
+
+    elif mode == 'tracemalloc':
+        import tracemalloc
+
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            lines = '\n'.join(str(stat) for stat in snapshot.statistics('lineno')[:top])
+            logger.info(f'tracemalloc current={current/1024/1024:.2f}MB peak={peak/1024/1024:.2f}MB\n{lines}')
+
+    else:
+        yield
+
+
 if __name__ == '__main__':
     import os
     from io import StringIO
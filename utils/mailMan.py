@@ -0,0 +1,330 @@
+
+"""
+mail transport
+
+build the report email and hand it to a transport:
+    SMTPTransport   - one persistent logged-in smtp connection (reconnects when dropped)
+    MaildirTransport - writes messages to a local maildir (no network)
+    SMTPPool        - a fixed number of SMTPTransports shared between threads
+    MailQueue       - batches messages and sends them through a pool with retries
+
+LocalSMTPServer is a small stdlib smtp server that keeps what it receives,
+so the whole send path can be load-tested without gmail.
+
+"""
+
+import ssl
+import time
+import queue
+import smtplib
+import mailbox
+import datetime
+import threading
+import socketserver
+from contextlib import contextmanager
+from email import message_from_bytes
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+
+# errors that are worth another try
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def build_email(config: dict, html: str, images: dict = None, attachments: dict = None, today=None) -> EmailMessage:
+    """
+    report email from the from_email / to_emails / email_subject config keys.
+    images: {cid: png path} embedded inline, referenced in the html as src="cid:..."
+    attachments: {filename: path} attached as files (already compressed, sent as is)
+    today: the report's date for the subject (default: the host's local date)
+    """
+    today = (today if today is not None else datetime.datetime.now()).strftime("%Y.%m.%d")
+
+    em = EmailMessage()
+    em['From'] = config["from_email"]
+    em['To'] = ",".join(config["to_emails"])
+    em['Subject'] = config["email_subject"].replace("YYYY.MM.DD", today)
+    em.set_content(html, subtype='html')
+    for cid, path in (images or {}).items():
+        with open(path, 'rb') as f:
+            em.add_related(f.read(), maintype='image', subtype='png', cid=f'<{cid}>')
+    for filename, path in (attachments or {}).items():
+        with open(path, 'rb') as f:
+            em.add_attachment(f.read(), maintype='application', subtype='gzip', filename=filename)
+    return em
+
+
+def is_transient(e: Exception) -> bool:
+    """ 4xx smtp replies and dropped connections can be retried, everything else can't """
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    return isinstance(e, TRANSIENT_ERRORS)
+
+
+class SMTPTransport:
+    """ persistent smtp connection, logs in once and reconnects if the server drops it """
+
+    def __init__(self,
+                 user: str = None,
+                 password: str = None,
+                 host: str = 'smtp.gmail.com',
+                 port: int = 465,
+                 use_ssl: bool = True,
+                 timeout: float = 30,
+                 ):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.smtp = None
+
+    def connect(self):
+        if self.use_ssl:
+            context = ssl.create_default_context()
+            self.smtp = smtplib.SMTP_SSL(self.host, self.port, context=context, timeout=self.timeout)
+        else:
+            self.smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.user:
+            self.smtp.login(self.user, self.password)
+
+    def send(self, em: EmailMessage):
+        if self.smtp is None:
+            self.connect()
+        try:
+            self.smtp.send_message(em)
+        except smtplib.SMTPServerDisconnected:
+            # idle connections get closed by the server, one quiet reconnect
+            self.connect()
+            self.smtp.send_message(em)
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self.smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MaildirTransport:
+    """ writes every message into a local maildir instead of sending it """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.maildir = mailbox.Maildir(path, create=True)
+
+    def send(self, em: EmailMessage):
+        self.maildir.add(em)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SMTPPool:
+    """ fixed number of transports handed out to one thread at a time """
+
+    def __init__(self, factory, size: int = 1):
+        self.size = size
+        self.transports = queue.Queue()
+        for _ in range(size):
+            self.transports.put(factory())
+
+    @contextmanager
+    def connection(self):
+        transport = self.transports.get()
+        try:
+            yield transport
+        finally:
+            self.transports.put(transport)
+
+    def close(self):
+        while not self.transports.empty():
+            self.transports.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MailQueue:
+    """ collects messages and sends them in batches, retrying transient failures with backoff """
+
+    def __init__(self,
+                 pool: SMTPPool,
+                 batch_size: int = 20,
+                 retries: int = 3,
+                 backoff: float = 1.0,
+                 logger: Logger = None,
+                 ):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+        self.pending = []
+
+    def put(self, em: EmailMessage):
+        self.pending.append(em)
+
+    def _send(self, transport, em: EmailMessage):
+        for attempt in range(self.retries + 1):
+            try:
+                transport.send(em)
+                return True
+            except Exception as e:
+                if not is_transient(e) or attempt == self.retries:
+                    self.logger.error(f"sending '{em['Subject']}' to {em['To']} failed: {e}")
+                    return False
+                wait = self.backoff * 2 ** attempt
+                self.logger.warning(f'transient smtp error ({e}), retrying in {wait:.1f}s')
+                time.sleep(wait)
+                transport.close()
+
+    def _send_batch(self, batch: list) -> list:
+        with self.pool.connection() as transport:
+            return [self._send(transport, em) for em in batch]
+
+    def flush(self) -> list:
+        """ send everything queued, returns a sent/failed bool per message (in put order) """
+        pending, self.pending = self.pending, []
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            for sent in executor.map(self._send_batch, batches):
+                results.extend(sent)
+        return results
+
+
+def make_transport(config: dict, credentials: dict):
+    """
+    transport picked by the 'mail_transport' config key:
+        smtp (default) - smtp_host / smtp_port, logs in with Email_USER / Email_PWD
+        local          - plain smtp without tls or login (e.g. LocalSMTPServer)
+        maildir        - writes to maildir_path
+    """
+    kind = config.get('mail_transport', 'smtp')
+    if kind == 'maildir':
+        return MaildirTransport(config.get('maildir_path', 'maildir'))
+    if kind == 'local':
+        return SMTPTransport(
+            host=config.get('smtp_host', 'localhost'),
+            port=config.get('smtp_port', 1025),
+            use_ssl=False,
+            )
+    return SMTPTransport(
+        user=credentials['Email_USER'],
+        password=credentials['Email_PWD'],
+        host=config.get('smtp_host', 'smtp.gmail.com'),
+        port=config.get('smtp_port', 465),
+        )
+
+
+def make_queue(config: dict, credentials: dict, logger: Logger = None) -> MailQueue:
+    """ MailQueue over a pool of 'smtp_pool_size' transports """
+    pool = SMTPPool(lambda: make_transport(config, credentials), size=config.get('smtp_pool_size', 1))
+    return MailQueue(
+        pool,
+        batch_size=config.get('smtp_batch_size', 20),
+        retries=config.get('smtp_retries', 3),
+        backoff=config.get('smtp_backoff', 1.0),
+        logger=logger,
+        )
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """ just enough smtp for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT """
+
+    def reply(self, line: str):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        self.reply('220 localhost habittracker local smtp')
+        rcpts = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                rcpts = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpts.append(command[8:].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 end data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b'.\n', b''):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                self.server.deliver(rcpts, b''.join(lines))
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    local smtp stand-in, keeps received messages in .messages
+    (and in a maildir if maildir_path is given)
+
+        with LocalSMTPServer(port=1025) as server:
+            server.start()
+            ...
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = 'localhost', port: int = 1025, maildir_path: str = None):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.lock = threading.Lock()
+        self.maildir = mailbox.Maildir(maildir_path, create=True) if maildir_path else None
+
+    def deliver(self, rcpts: list, data: bytes):
+        em = message_from_bytes(data)
+        with self.lock:
+            self.messages.append((rcpts, em))
+            if self.maildir is not None:
+                self.maildir.add(em)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,218 @@
+
+"""
+html report writer
+
+the template is split once around {{content}} and every section is written
+straight into one buffer. habit cells get their colour as they are written,
+so there is no to_html + str.replace pass over the finished document.
+
+compact mode drops the inline styles and bootstrap class lists: habit cells
+get a one letter class (n/z/p) styled once in the template's <style> block,
+and minify() strips comments and the whitespace between tags.
+
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import math
+import datetime
+from html import escape
+from io import StringIO
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+TABLE_CLASSES = 'table table-striped table-hover table-bordered table-responsive'
+
+CELL_STYLES = {
+    -1: 'background-color:#ff4d4d;color:white;',
+    0: 'background-color:#eeeeee;color:black;',
+    1: 'background-color:#4dff88;color:black;',
+}
+
+# finished <td> for every coloured value, so writing a habit cell is a dict lookup
+COLOURED_CELLS = {v: f'<td style="{style}">{v}</td>' for v, style in CELL_STYLES.items()}
+
+# compact mode: the same colours as classes, defined once in the template
+CELL_CLASSES = {-1: 'n', 0: 'z', 1: 'p'}
+COMPACT_CELLS = {v: f'<td class={c}>{v}</td>' for v, c in CELL_CLASSES.items()}
+COMPACT_CSS = ''.join(f'td.{CELL_CLASSES[v]}{{{style}}}' for v, style in CELL_STYLES.items()) + 'table.s{font-size:18px}'
+
+
+
+class Gradient:
+    """
+    white -> colour background scale as a lookup table of finished styles.
+    a column is scaled between its own min and max (like Styler.background_gradient),
+    text turns white on dark backgrounds
+    """
+
+    def __init__(self, colour: str, steps: int = 64):
+        self.steps = steps
+        end = [int(colour[i:i + 2], 16) for i in (1, 3, 5)]
+        self.styles = []
+        for i in range(steps):
+            t = i / (steps - 1)
+            rgb = [round(255 + (c - 255) * t) for c in end]
+            # relative luminance, same threshold as pandas' text_color_threshold
+            lin = [(c / 255) / 12.92 if c / 255 <= 0.04045 else ((c / 255 + 0.055) / 1.055) ** 2.4 for c in rgb]
+            dark = 0.2126 * lin[0] + 0.7152 * lin[1] + 0.0722 * lin[2] < 0.408
+            hex_colour = '#' + ''.join(f'{c:02x}' for c in rgb)
+            self.styles.append(f'background-color:{hex_colour};color:{"white" if dark else "black"};')
+
+    def cells(self, values: list) -> list:
+        """ <td> for every value of a numeric column """
+        a = np.asarray(values, dtype=float)
+        if len(a) == 0:
+            return []
+        lo, hi = np.nanmin(a), np.nanmax(a)
+        scale = (self.steps - 1) / (hi - lo) if hi > lo else 0.0
+        idx = np.nan_to_num((a - lo) * scale).astype(int)
+        styles = self.styles
+        return [f'<td style="{styles[i]}">{cell_text(v)}</td>' for i, v in zip(idx.tolist(), values)]
+
+
+# summary tables: done / failed / unmarked counts
+SUMMARY_GRADIENTS = {
+    '✅': Gradient('#4dff88'),
+    '⛔': Gradient('#ff4d4d'),
+    '🔲': Gradient('#aaaaaa'),
+}
+
+_comments = re.compile(r'<!--.*?-->|/\*.*?\*/', re.S)
+_between_tags = re.compile(r'>\s+<')
+_spaces = re.compile(r'\s{2,}')
+
+
+def minify(html: str) -> str:
+    """ drop html/css comments and whitespace between tags (the report has no <pre>) """
+    html = _comments.sub('', html)
+    html = _between_tags.sub('><', html)
+    return _spaces.sub(' ', html).strip()
+
+
+class Template:
+    """ html template pre-split around the {{content}} marker """
+
+    MARKER = '{{content}}'
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, 'r', encoding='utf8') as f:
+            text = f.read()
+        self.head, _, self.tail = text.partition(self.MARKER)
+
+
+_templates = {}
+
+
+def load_template(file_path: str) -> Template:
+    """ parsed template, cached until the file changes """
+    mtime = os.path.getmtime(file_path)
+    cached = _templates.get(file_path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, Template(file_path))
+        _templates[file_path] = cached
+    return cached[1]
+
+
+def cell_text(value) -> str:
+    """ text for one table cell """
+    if value is None or value is pd.NaT:
+        return ''
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.strftime('%Y-%m-%d')
+    return escape(str(value))
+
+
+class Report:
+    """ writes a report section by section into a single buffer """
+
+    def __init__(self, template: Template = None, compact: bool = False):
+        """ template: None writes a bare html fragment """
+        self.template = template
+        self.compact = compact
+        self.cells = COMPACT_CELLS if compact else COLOURED_CELLS
+        self.buf = StringIO()
+        head = template.head if template is not None else ''
+        if compact and template is not None and 'td.p' not in head:
+            # custom template without the compact classes
+            style = f'<style>{COMPACT_CSS}</style>'
+            head = head.replace('</head>', style + '</head>', 1) if '</head>' in head else style + head
+        self.buf.write(head)
+
+    def write(self, html: str):
+        self.buf.write(html)
+
+    def heading(self, text: str, level: int = 2):
+        self.buf.write(f'<h{level}>{text}</h{level}>')
+
+    def rule(self):
+        self.buf.write('<hr>')
+
+    def start_table(self, classes: str = TABLE_CLASSES, large: bool = False):
+        """ opening <table> tag, large: 18px text (streak tables) """
+        if self.compact:
+            self.buf.write('<table class=s>' if large else '<table>')
+        elif large:
+            self.buf.write(f'<table style="font-size: 18px;"  class="dataframe {classes}">')
+        else:
+            self.buf.write(f'<table border="0" class="dataframe {classes}">')
+
+    def table(self,
+              df: pd.DataFrame,
+              colour: list = None,
+              classes: str = TABLE_CLASSES,
+              index: bool = False,
+              gradient: dict = None,
+              ):
+        """
+        write df as a table, cells in the `colour` columns are coloured by value.
+        index: write the index as the first column
+        gradient: {column: Gradient} background scale for numeric columns
+        """
+        gradient = gradient or {}
+        colour = set(colour or [])
+        cells = self.cells
+        write = self.buf.write
+
+        self.start_table(classes)
+        write('<thead><tr>' if self.compact else '<thead><tr style="text-align: right;">')
+        if index:
+            write(f'<th>{escape(str(df.index.name or ""))}</th>')
+        for col in df.columns:
+            write(f'<th>{escape(str(col))}</th>')
+        write('</tr></thead><tbody>')
+
+        columns = []
+        if index:
+            columns.append([f'<td>{cell_text(v)}</td>' for v in df.index.tolist()])
+        for col in df.columns:
+            values = df[col].tolist()
+            if col in gradient:
+                columns.append(gradient[col].cells(values))
+            elif col in colour:
+                columns.append([cells.get(v) or f'<td>{cell_text(v)}</td>' for v in values])
+            else:
+                columns.append([f'<td>{cell_text(v)}</td>' for v in values])
+
+        for row in zip(*columns):
+            write('<tr>')
+            write(''.join(row))
+            write('</tr>')
+        write('</tbody></table>')
+
+    def render(self) -> str:
+        """ close the template and return the finished html """
+        if self.template is not None:
+            self.buf.write(self.template.tail)
+        return self.buf.getvalue()
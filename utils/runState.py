@@ -0,0 +1,77 @@
+
+"""
+run state / change detection
+
+remembers what the last run of a tracker saw (sheet modified time and a
+fingerprint of the habit data) together with the message it rendered,
+so a run where nothing changed can skip aggregation and rendering.
+
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import datetime
+
+
+def fingerprint(data, *extra) -> str:
+    """ sha256 of a normalized habit frame (dates, habit names, values) plus anything in extra """
+    h = hashlib.sha256()
+    h.update('\x1f'.join(map(str, data.columns)).encode())
+    h.update(data.index.values.tobytes())
+    h.update(data.to_numpy().tobytes())
+    for item in extra:
+        h.update(b'\x1e' + str(item).encode())
+    return h.hexdigest()
+
+
+def config_hash(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RunState:
+    """ last run of one tracker, kept as <key>.json + <key>.html """
+
+    def __init__(self, root: str, key: str):
+        self.root = root
+        if os.path.exists(self.root) == False:
+            os.makedirs(self.root)
+
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in key)
+        self.state_file = os.path.join(root, f'{safe}.json')
+        self.message_file = os.path.join(root, f'{safe}.html')
+        self.data = self.load()
+
+    def load(self) -> dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def message(self) -> str:
+        """ last rendered message, None if there isn't one """
+        try:
+            with open(self.message_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save(self, message: str = None, **fields):
+        """ store the new state (and message) atomically """
+        if message is not None:
+            tmp = self.message_file + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(message)
+            os.replace(tmp, self.message_file)
+
+        self.data = {**self.data, **fields, 'saved': datetime.datetime.now().isoformat(timespec='seconds')}
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp, self.state_file)
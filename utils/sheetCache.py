@@ -0,0 +1,219 @@
+
+"""
+local cache of a google sheet
+
+keeps a pickled copy of the sheet (keyed by gsheet_id) under cache/
+and only pulls the rows that were appended since the last sync.
+
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import csv
+import json
+from logging import Logger
+
+from utils.lazy import lazy_import
+
+pd = lazy_import('pandas')
+gspread = lazy_import('gspread')
+service_account = lazy_import('oauth2client.service_account')
+
+# cached rows fetched again on every incremental sync
+OVERLAP = 14
+
+
+def _col_letter(n: int) -> str:
+    """ 1 -> A, 27 -> AA """
+    letters = ''
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+def _numericise(value):
+    """ same idea as gspread's numericise: '1' -> 1, '1.5' -> 1.5, else unchanged """
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+
+def records_to_frame(header: list, rows: list) -> pd.DataFrame:
+    """ turn raw sheet values into the same frame get_all_records() would give """
+    width = len(header)
+    records = []
+    for row in rows:
+        row = list(row)[:width]
+        row += [''] * (width - len(row))
+        records.append([_numericise(v) for v in row])
+    return pd.DataFrame(records, columns=header)
+
+
+class LocalSheet:
+    """
+    offline stand-in for a gspread worksheet backed by a csv file
+    (only implements what SheetCache needs)
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def _values(self):
+        with open(self.file_path, 'r', encoding='utf-8', newline='') as f:
+            return [row for row in csv.reader(f)]
+
+    def row_values(self, row: int):
+        values = self._values()
+        if row - 1 < len(values):
+            return values[row - 1]
+        return []
+
+    def modified_time(self) -> str:
+        return str(os.path.getmtime(self.file_path))
+
+    def get_values(self, range_name: str):
+        match = re.match(r'^[A-Z]+(\d+)(?::[A-Z]+(\d+))?', range_name)
+        start = int(match.group(1)) if match else 1
+        end = int(match.group(2)) if match and match.group(2) else None
+        return self._values()[start - 1:end]
+
+
+class SheetCache:
+    """ incremental local copy of a google sheet """
+
+    def __init__(self,
+                 root: str,
+                 gsheet_id: str,
+                 logger: Logger = None,
+                 ):
+        self.root = root
+        self.gsheet_id = gsheet_id
+
+        self.logger = logger
+        if self.logger == None:
+            self.logger = Logger('log')
+
+        if os.path.exists(self.root) == False:
+            os.mkdir(self.root)
+
+        self.data_file = os.path.join(self.root, f'{gsheet_id}.pkl')
+        self.meta_file = os.path.join(self.root, f'{gsheet_id}.json')
+
+        self.data = None
+        self.meta = {}
+        self.load()
+
+    def load(self):
+        """ load the cached frame + sync info, if there is one """
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            self.data = pd.read_pickle(self.data_file)
+        except Exception:
+            self.meta = {}
+            self.data = None
+
+    def save(self):
+        # temp file + rename, workers sharing cache/ never read half a file
+        tmp = f'{self.data_file}.{os.getpid()}.tmp'
+        self.data.to_pickle(tmp)
+        os.replace(tmp, self.data_file)
+        tmp = f'{self.meta_file}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=4)
+        os.replace(tmp, self.meta_file)
+
+    def full_sync(self, sheet, header: list) -> pd.DataFrame:
+        """ pull the whole sheet """
+        values = sheet.get_values(f'A2:{_col_letter(len(header))}')
+        self.data = records_to_frame(header, values)
+        self.logger.info(f'full sync of {self.gsheet_id}: {len(self.data)} rows')
+        return self.data
+
+    def sync(self, sheet) -> pd.DataFrame:
+        """
+        bring the cache up to date with the sheet and return a copy of it.
+        the last OVERLAP cached rows are fetched again, so recent edits and
+        backfilled days are picked up. a moved/deleted row (dates don't line
+        up), or a sheet that was modified without any change showing in the
+        overlap (an older row was edited), forces a full sync
+        """
+        header = sheet.row_values(1)
+        modified = modified_time(sheet)
+
+        if self.data is None or self.meta.get('header') != header or len(self.data) == 0:
+            self.full_sync(sheet, header)
+        else:
+            rows = len(self.data)
+            overlap = min(OVERLAP, rows)
+            # sheet row of the first re-fetched record (row 1 is the header)
+            start = rows - overlap + 2
+            values = sheet.get_values(f'A{start}:{_col_letter(len(header))}')
+            new = records_to_frame(header, values)
+
+            cached = self.data.iloc[rows - overlap:].reset_index(drop=True).astype(str)
+            fetched = new.iloc[:overlap].reset_index(drop=True).astype(str)
+            edited = not fetched.equals(cached)
+            moved = modified is not None and modified != self.meta.get('modified')
+            aligned = len(new) >= overlap and ('Date' not in header or fetched['Date'].equals(cached['Date']))
+
+            if not aligned:
+                self.logger.info(f'{self.gsheet_id} changed above row {start}, doing a full sync')
+                self.full_sync(sheet, header)
+            elif moved and not edited and len(new) == overlap:
+                self.logger.info(f'{self.gsheet_id} was modified above row {start}, doing a full sync')
+                self.full_sync(sheet, header)
+            else:
+                self.data = pd.concat([self.data.iloc[:rows - overlap], new], ignore_index=True)
+                self.logger.info(f'incremental sync of {self.gsheet_id}: {len(new) - overlap} new rows')
+
+        self.meta = {
+            'header': header,
+            'modified': modified,
+            'rows': len(self.data),
+            'last_date': str(self.data.iloc[-1]['Date']) if len(self.data) and 'Date' in self.data else None,
+        }
+        self.save()
+        return self.data.copy()
+
+
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file"
+]
+
+
+def authorize(gsheet_key: str):
+    """ gspread client for the service account key file """
+    creds = service_account.ServiceAccountCredentials.from_json_keyfile_name(gsheet_key, SCOPE)
+    return gspread.authorize(creds)
+
+
+def open_sheet(client, gsheet_id: str, local_sheet: str = None):
+    """ first worksheet of the sheet, or the csv stand-in when local_sheet is given """
+    if local_sheet:
+        return LocalSheet(local_sheet)
+    return client.open_by_key(gsheet_id).sheet1
+
+
+def modified_time(sheet) -> str:
+    """ last modified time of the sheet from its metadata (no values are read), None if unknown """
+    if hasattr(sheet, 'modified_time'):
+        return sheet.modified_time()
+    spreadsheet = getattr(sheet, 'spreadsheet', None)
+    try:
+        if hasattr(spreadsheet, 'get_lastUpdateTime'):
+            return spreadsheet.get_lastUpdateTime()
+        return spreadsheet.lastUpdateTime
+    except Exception:
+        return None
@@ -0,0 +1,175 @@
+
+"""
+streak index
+
+run-length encodes the whole habit matrix once, so current streaks,
+longest streaks and streak history for every habit are plain lookups.
+
+StreakState keeps only the current and longest streaks, so it can be
+folded block by block over a history that never sits in memory at once.
+
+"""
+
+from __future__ import annotations
+
+from utils.lazy import lazy_import
+from utils.summary import VALUES
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+def encode_runs(matrix: np.ndarray, offset: int = 0) -> dict:
+    """
+    run-length encode every column of a (days, habits) matrix (oldest day first)
+    returns arrays of habit, value, start day and length for every run,
+    sorted by habit then start
+    """
+    days, cols = matrix.shape
+    if days == 0 or cols == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return {'habit': empty, 'value': empty.astype(np.int8), 'start': empty, 'length': empty}
+
+    flat = np.ascontiguousarray(matrix.T).ravel()
+    change = np.empty(flat.size, dtype=bool)
+    change[0] = True
+    change[1:] = flat[1:] != flat[:-1]
+    # every habit starts a new run on its first day
+    change[::days] = True
+
+    starts = np.flatnonzero(change)
+    return {
+        'habit': starts // days,
+        'value': flat[starts],
+        'start': starts % days + offset,
+        'length': np.diff(np.append(starts, flat.size)),
+    }
+
+
+class StreakIndex:
+    """ streaks for every habit, built from the habit matrix in one pass """
+
+    def __init__(self, habits: list, dates, matrix: np.ndarray):
+        """ dates/matrix must be oldest day first """
+        self.habits = list(habits)
+        self.dates = pd.DatetimeIndex(dates)
+        self.days = matrix.shape[0]
+        self.runs = encode_runs(matrix)
+        self._refresh()
+
+    def _refresh(self):
+        """ recompute the per-habit lookups from the run arrays """
+        n = len(self.habits)
+        habit = self.runs['habit']
+        value = self.runs['value'].astype(np.intp)
+        length = self.runs['length']
+
+        self.last_value = np.full(n, 2, dtype=np.int8)
+        self.last_length = np.zeros(n, dtype=np.int64)
+        if len(habit):
+            last = np.searchsorted(habit, np.arange(n), side='right') - 1
+            has_runs = (last >= 0) & (habit[np.clip(last, 0, None)] == np.arange(n))
+            self.last_value[has_runs] = self.runs['value'][last[has_runs]]
+            self.last_length[has_runs] = length[last[has_runs]]
+
+        # longest run per habit per value (-1, 0, 1)
+        self.longest_runs = np.zeros((n, len(VALUES)), dtype=np.int64)
+        valid = value <= 1
+        np.maximum.at(self.longest_runs, (habit[valid], value[valid] + 1), length[valid])
+
+    def append(self, dates, matrix: np.ndarray):
+        """ add new days (oldest first) without re-encoding the existing history """
+        if matrix.shape[0] == 0:
+            return
+        new = encode_runs(matrix, offset=self.days)
+
+        keep = np.ones(len(new['habit']), dtype=bool)
+        if self.days > 0:
+            n = len(self.habits)
+            first = np.searchsorted(new['habit'], np.arange(n))
+            last = np.searchsorted(self.runs['habit'], np.arange(n), side='right') - 1
+            # the first new run continues the current run if the value didn't change
+            merge = new['value'][first] == self.last_value
+            self.runs['length'][last[merge]] += new['length'][first[merge]]
+            keep[first[merge]] = False
+
+        runs = {k: np.concatenate([self.runs[k], new[k][keep]]) for k in self.runs}
+        order = np.lexsort((runs['start'], runs['habit']))
+        self.runs = {k: v[order] for k, v in runs.items()}
+
+        self.dates = self.dates.append(pd.DatetimeIndex(dates))
+        self.days += matrix.shape[0]
+        self._refresh()
+
+    def current(self, value: int = 1) -> pd.Series:
+        """ current streak of `value` for every habit (0 if the last day isn't `value`) """
+        streak = np.where(self.last_value == value, self.last_length, 0)
+        return pd.Series(streak, index=self.habits)
+
+    def longest(self, value: int = 1) -> pd.Series:
+        """ longest streak of `value` ever, for every habit """
+        return pd.Series(self.longest_runs[:, value + 1], index=self.habits)
+
+    def history(self, value: int = 1, min_length: int = 1) -> pd.DataFrame:
+        """ every streak of `value` (Habit, Start, End, Length) """
+        mask = (self.runs['value'] == value) & (self.runs['length'] >= min_length)
+        start = self.runs['start'][mask]
+        length = self.runs['length'][mask]
+        return pd.DataFrame({
+            "Habit": np.asarray(self.habits, dtype=object)[self.runs['habit'][mask]],
+            "Start": self.dates[start],
+            "End": self.dates[start + length - 1],
+            "Length": length,
+        })
+
+
+class StreakState:
+    """ current + longest streaks per habit, folded in blocks (O(habits) memory) """
+
+    def __init__(self, habits: list):
+        n = len(habits)
+        self.habits = list(habits)
+        self.days = 0
+        self.last_value = np.full(n, 2, dtype=np.int8)
+        self.last_length = np.zeros(n, dtype=np.int64)
+        self.longest_runs = np.zeros((n, len(VALUES)), dtype=np.int64)
+
+    def add_habits(self, habits: list):
+        """ new habit columns, their days so far count as 0 """
+        n = len(habits)
+        self.habits += list(habits)
+        self.last_value = np.append(self.last_value, np.full(n, 0 if self.days else 2, dtype=np.int8))
+        self.last_length = np.append(self.last_length, np.full(n, self.days, dtype=np.int64))
+        added = np.zeros((n, len(VALUES)), dtype=np.int64)
+        added[:, 1] = self.days
+        self.longest_runs = np.vstack([self.longest_runs, added])
+
+    def append(self, matrix: np.ndarray):
+        """ fold the next days (oldest first) into the state """
+        if matrix.shape[0] == 0:
+            return
+        runs = encode_runs(matrix)
+        n = len(self.habits)
+        first = np.searchsorted(runs['habit'], np.arange(n))
+        last = np.searchsorted(runs['habit'], np.arange(n), side='right') - 1
+
+        length = runs['length'].copy()
+        if self.days > 0:
+            # the first run of the block continues the current run if the value didn't change
+            merge = runs['value'][first] == self.last_value
+            length[first[merge]] += self.last_length[merge]
+
+        value = runs['value'].astype(np.intp)
+        valid = value <= 1
+        np.maximum.at(self.longest_runs, (runs['habit'][valid], value[valid] + 1), length[valid])
+
+        self.last_value = runs['value'][last]
+        self.last_length = length[last]
+        self.days += matrix.shape[0]
+
+    def current(self, value: int = 1) -> pd.Series:
+        streak = np.where(self.last_value == value, self.last_length, 0)
+        return pd.Series(streak, index=self.habits)
+
+    def longest(self, value: int = 1) -> pd.Series:
+        return pd.Series(self.longest_runs[:, value + 1], index=self.habits)
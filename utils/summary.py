@@ -0,0 +1,44 @@
+
+"""
+habit summaries
+
+counts ✅/⛔/🔲 for every habit with one bincount over the habit matrix
+instead of building boolean masks per habit.
+
+"""
+
+from __future__ import annotations
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# column order of the count arrays
+VALUES = (-1, 0, 1)
+
+
+def value_counts(matrix: np.ndarray) -> np.ndarray:
+    """ (habits, 3) array with the number of -1, 0 and 1 per habit column """
+    rows, cols = matrix.shape
+    # shift -1/0/1/2 to 0..3 and give every column its own block of 4 bins
+    codes = (matrix.astype(np.intp) + 1) + (np.arange(cols, dtype=np.intp) * 4)
+    counts = np.bincount(codes.ravel(), minlength=cols * 4).reshape(cols, 4)
+    return counts[:, :3]
+
+
+def summary_frame(habits: list, counts: np.ndarray, days: int) -> pd.DataFrame:
+    """ build the Habit/Percent/Bar/✅/⛔/🔲 table from a counts array """
+    done = counts[:, 2]
+    percent = done / days if days > 0 else np.zeros(len(habits))
+
+    filled = (percent * 25.0).astype(int)
+    return pd.DataFrame({
+        "Habit": habits,
+        "Percent": [f'{p*100.0:.2f}%' for p in percent],
+        "Bar": ['█' * f + '░' * (25 - f) for f in filled],
+        "✅": done.astype(int),
+        "⛔": counts[:, 0].astype(int),
+        "🔲": counts[:, 1].astype(int),
+    })
+
@@ -0,0 +1,49 @@
+
+"""
+synthetic habit sheets
+
+same shape as the google sheet (Date, emoji habit columns with -1/0/1 and
+the Month/Week/Year/DeltaDay/📶 helper columns), for benchmarks and
+offline runs.
+
+"""
+
+from __future__ import annotations
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+EMOJI = ['❌📱', '💊', '❌🍗', '❌🍔', '140♥️', '💪', '🦷', '❌🥜',
+         '🏃', '📚', '💧', '🧘', '🛏️', '🥗', '🚭', '🍺', '☕', '🎸', '✍️', '🧹']
+
+
+def habit_names(n: int) -> list:
+    """ n unique habit column names (emoji, numbered once they run out) """
+    return [EMOJI[i % len(EMOJI)] + (str(i // len(EMOJI)) if i >= len(EMOJI) else '') for i in range(n)]
+
+
+def synthetic_sheet(days: int,
+                    habits: int,
+                    end: str = None,
+                    seed: int = 0,
+                    p: tuple = (0.25, 0.25, 0.5),
+                    ) -> pd.DataFrame:
+    """
+    `days` rows ending at `end` (default today) with `habits` habit columns.
+    p: probability of -1, 0, 1
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end) if end else pd.Timestamp.now().normalize()
+    dates = pd.date_range(end=end, periods=days, freq='D')
+
+    values = rng.choice(np.array([-1, 0, 1], dtype=np.int8), size=(days, habits), p=p)
+    df = pd.DataFrame(values, columns=habit_names(habits))
+    df.insert(0, 'Date', dates.strftime('%Y-%m-%d'))
+    df['Month'] = dates.month
+    df['Week'] = dates.isocalendar().week.to_numpy()
+    df['Year'] = dates.year
+    df['DeltaDay'] = (dates - dates[0]).days
+    df['📶'] = values.sum(axis=1)
+    return df
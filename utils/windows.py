@@ -0,0 +1,77 @@
+
+"""
+rolling windows
+
+cumulative -1/0/1 counts per habit over the sorted date index, so the
+counts for any date window are two searchsorted lookups and a subtraction.
+days with no row (nothing logged yet up to `end`) count as 0, so a window
+is always divided by its calendar days since the first recorded day.
+
+    counter = WindowCounter(data.index, matrix)
+    counts, days = counter.last(30, today)
+
+"""
+
+from __future__ import annotations
+
+from utils.lazy import lazy_import
+from utils.summary import VALUES
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+def window_label(window) -> str:
+    """ 7 -> 'Last 7 Days', 'mtd' -> 'Month to Date' """
+    if window == 'mtd':
+        return 'Month to Date'
+    return f'Last {window} Days'
+
+
+class WindowCounter:
+    """ prefix sums of -1/0/1 counts per habit """
+
+    def __init__(self, dates, matrix: np.ndarray):
+        """ dates/matrix rows in any order, they get sorted oldest first """
+        dates = np.asarray(pd.DatetimeIndex(dates).values)
+        order = np.argsort(dates, kind='stable')
+        self.dates = dates[order]
+        matrix = matrix[order]
+
+        days, habits = matrix.shape
+        # cum[i] = counts over the first i days, so cum[hi] - cum[lo] covers days lo..hi-1
+        self.cum = np.zeros((days + 1, habits, len(VALUES)), dtype=np.int32)
+        for i, value in enumerate(VALUES):
+            np.cumsum(matrix == value, axis=0, out=self.cum[1:, :, i])
+
+    def counts(self, start=None, end=None) -> tuple:
+        """ ((habits, 3) counts, number of days) for start <= date <= end """
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side='right')
+        hi = max(hi, lo)
+        counts, days = self.cum[hi] - self.cum[lo], int(hi - lo)
+
+        if end is not None and len(self.dates) > 0:
+            # calendar days from the first recorded day (or start) to end, the missing ones as 0
+            first = pd.Timestamp(self.dates[0])
+            begin = first if start is None else max(pd.Timestamp(start), first)
+            calendar = (pd.Timestamp(end) - begin).days + 1
+            if calendar > days:
+                counts[:, VALUES.index(0)] += calendar - days
+                days = calendar
+        return counts, days
+
+    def last(self, days: int, today=None) -> tuple:
+        """ counts for the `days` days ending today """
+        today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+        return self.counts(today - pd.Timedelta(days=days - 1), today)
+
+    def month_to_date(self, today=None) -> tuple:
+        today = pd.Timestamp(today) if today is not None else pd.Timestamp.now().normalize()
+        return self.counts(today.replace(day=1), today)
+
+    def window(self, window, today=None) -> tuple:
+        """ counts for a window spec: number of days or 'mtd' """
+        if window == 'mtd':
+            return self.month_to_date(today)
+        return self.last(int(window), today)
@@ -0,0 +1,165 @@
+# !/bin/env python
+
+"""
+Habit Tracker Workers
+spread the reports over several processes / hosts through a sqlite job queue
+
+    python worker.py enqueue trackers.json --queue jobs.db
+    python worker.py work --queue jobs.db --processes 4 --exit-when-empty
+    python worker.py status --queue jobs.db
+
+every worker claims a job with a lease, keeps it alive with a heartbeat
+while it fetches / aggregates / renders / sends, and marks it done or
+hands it back for a retry. a worker that dies loses its lease and the job
+is picked up by another one.
+
+"""
+
+import os
+import signal
+import socket
+import argparse
+import threading
+import multiprocessing
+from logging import Logger
+
+from main import GSHEET_ID
+from daemon import Daemon
+from utils.logMan import createLogger
+from utils.dataMan import DataManager as DM
+from utils.jobQueue import JobQueue
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def enqueue(trackers_file: str, queue_file: str, max_attempts: int = 3, logger: Logger = None, wal: bool = False) -> list:
+    """ one job per tracker in trackers_file, returns the job ids """
+    if logger == None:
+        logger = Logger('log')
+    trackers = DM(trackers_file, logger=logger, default=[]).data
+    queue = JobQueue(queue_file, logger=logger, wal=wal)
+    ids = [queue.put(tracker, max_attempts=max_attempts) for tracker in trackers]
+    queue.close()
+    logger.info(f'queued {len(ids)} jobs')
+    return ids
+
+
+class Worker(Daemon):
+    """ takes jobs off the queue, with the daemon's warm clients / caches / mail pool """
+
+    def __init__(self,
+                 queue_file: str = 'jobs.db',
+                 config_file: str = 'config.json',
+                 credentials_file: str = 'credentials.json',
+                 lease: float = 300,
+                 backoff: float = 30.0,
+                 wal: bool = False,
+                 logger: Logger = None,
+                 ):
+        super().__init__(None, config_file, credentials_file, logger)
+        self.queue_file = queue_file
+        self.queue = JobQueue(queue_file, logger=self.logger, backoff=backoff, wal=wal)
+        self.lease = lease
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def heartbeat(self, job_id: int, finished: threading.Event):
+        """ keep the lease alive until the job is finished (own connection, own thread) """
+        queue = JobQueue(self.queue_file, logger=self.logger)
+        while not finished.wait(self.lease / 3):
+            if queue.heartbeat(job_id, self.name, self.lease) == False:
+                self.logger.warning(f'lost the lease on job {job_id}')
+                break
+        queue.close()
+
+    def run_job(self, job: dict):
+        tracker = job['payload']
+        tracker.setdefault('gsheet_id', self.config.data.get('gsheet_id', GSHEET_ID))
+        tracker.setdefault('name', f"job-{job['id']}")
+
+        finished = threading.Event()
+        beat = threading.Thread(target=self.heartbeat, args=(job['id'], finished), daemon=True)
+        beat.start()
+        try:
+            sent = self.run_tracker(tracker)
+            error = None if sent else 'send failed'
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        finally:
+            finished.set()
+            beat.join()
+
+        if error is None:
+            self.queue.done(job['id'], self.name)
+            self.logger.info(f"job {job['id']} ({tracker['name']}) done")
+        else:
+            self.queue.fail(job['id'], self.name, error)
+            self.logger.error(f"job {job['id']} ({tracker['name']}) attempt {job['attempts']} failed: {error}")
+
+    def work(self, poll: float = 5.0, exit_when_empty: bool = False) -> int:
+        """ claim and run jobs until stop() (or the queue is empty), returns how many ran """
+        ran = 0
+        self.logger.info(f'worker {self.name} started')
+        while not self.stop_event.is_set():
+            job = self.queue.claim(self.name, self.lease)
+            if job is None:
+                if exit_when_empty and self.queue.pending() == 0:
+                    break
+                self.stop_event.wait(poll)
+                continue
+            self.run_job(job)
+            ran += 1
+        self.close()
+        self.queue.close()
+        self.logger.info(f'worker {self.name} stopped after {ran} jobs')
+        return ran
+
+
+def _work(args):
+    worker = Worker(args.queue, args.config, args.credentials, args.lease, args.backoff, args.wal)
+    signal.signal(signal.SIGTERM, worker.stop)
+    worker.work(args.poll, args.exit_when_empty)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='habit tracker report queue')
+    parser.add_argument('--queue', default='jobs.db')
+    parser.add_argument('--wal', action='store_true', help='WAL journal, only when every worker is on this host')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('enqueue', help='queue a job per tracker')
+    p.add_argument('trackers', nargs='?', default='trackers.json')
+    p.add_argument('--attempts', type=int, default=3)
+
+    p = commands.add_parser('work', help='run jobs')
+    p.add_argument('--config', default='config.json')
+    p.add_argument('--credentials', default='credentials.json')
+    p.add_argument('--processes', type=int, default=1)
+    p.add_argument('--lease', type=float, default=300, help='seconds a job is held without a heartbeat')
+    p.add_argument('--backoff', type=float, default=30.0, help='seconds before the first retry, doubled on every attempt')
+    p.add_argument('--poll', type=float, default=5.0)
+    p.add_argument('--exit-when-empty', action='store_true')
+
+    p = commands.add_parser('status', help='job counts')
+    p.add_argument('--retry-failed', action='store_true')
+
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        enqueue(args.trackers, args.queue, args.attempts, logger=createLogger(root=os.path.join(DIR, 'log'), useStreamHandler=True), wal=args.wal)
+
+    elif args.command == 'work':
+        if args.processes == 1:
+            _work(args)
+        else:
+            processes = [multiprocessing.Process(target=_work, args=(args,)) for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+
+    elif args.command == 'status':
+        queue = JobQueue(args.queue, wal=args.wal)
+        if args.retry_failed:
+            print(f'{queue.retry_failed()} failed jobs queued again')
+        for status, n in queue.stats().items():
+            print(f'{status:<8}{n}')